@@ -0,0 +1,34 @@
+"""Mapping of service failures to HTTP errors."""
+
+from fastapi import HTTPException
+
+from app.services.llm_errors import (
+    LLMNotConfiguredError,
+    LLMQuotaExceededError,
+    LLMRateLimitError,
+    LLMTimeoutError,
+    LLMUnavailableError,
+    to_llm_error,
+)
+
+
+def llm_http_error(exc: Exception, default_detail: str) -> HTTPException:
+    """503 for provider quota/rate-limit/outage errors, 500 with default_detail otherwise."""
+    error = to_llm_error(exc)
+    if isinstance(error, LLMQuotaExceededError):
+        return HTTPException(
+            status_code=503,
+            detail="AI service quota exceeded. Please add billing/credits for your AI provider account.",
+        )
+    if isinstance(error, LLMRateLimitError):
+        headers = {"Retry-After": str(int(error.retry_after))} if error.retry_after else None
+        return HTTPException(
+            status_code=503,
+            detail="AI service is rate limited. Please retry shortly.",
+            headers=headers,
+        )
+    if isinstance(error, (LLMTimeoutError, LLMUnavailableError)):
+        return HTTPException(status_code=503, detail="AI service temporarily unavailable. Please retry shortly.")
+    if isinstance(error, LLMNotConfiguredError):
+        return HTTPException(status_code=503, detail="AI service is not configured.")
+    return HTTPException(status_code=500, detail=default_detail)
@@ -0,0 +1,26 @@
+"""Server-sent events helpers for streaming endpoints."""
+
+import json
+
+from fastapi.responses import StreamingResponse
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop nginx-style proxies from buffering the stream.
+    "X-Accel-Buffering": "no",
+}
+
+
+def sse_event(event: str, data) -> str:
+    """Encode one event; data is serialised as JSON on a single line."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def sse_response(events, background=None) -> StreamingResponse:
+    """``background`` (a BackgroundTask or BackgroundTasks) runs after the stream has finished."""
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+        background=background,
+    )
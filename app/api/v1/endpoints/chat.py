@@ -1,12 +1,17 @@
 """Chat endpoints."""
 
+import asyncio
+import logging
+from dataclasses import asdict
 from datetime import datetime
 from uuid import UUID, uuid4
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db
+from app.api.errors import llm_http_error
+from app.api.sse import sse_event, sse_response
 from app.auth.deps import get_optional_current_user
 from app.models import User
 from app.schemas.chat import (
@@ -18,16 +23,27 @@ from app.schemas.chat import (
     CreateChatRequest,
 )
 from app.services.chat_service import (
+    aprocess_chat_message,
+    astart_chat_message,
+    aupdate_chat_summary,
     create_chat,
     get_chat,
     get_chat_messages,
     list_chats,
-    process_chat_message,
+    store_message_embedding,
+    store_streamed_reply,
 )
-from app.services.rag_service import query_rag
+from app.services.pipeline_context import PipelineContext
+from app.services.rag_service import aprepare_query, aquery_rag, astream_prepared, finish_prepared
+from app.services.retrieval_service import RetrievalFilters
 from app.services.user_service import get_or_create_anonymous_user
 
 router = APIRouter(prefix="/chat", tags=["chat"])
+logger = logging.getLogger(__name__)
+
+
+def _chat_http_error(exc: Exception) -> HTTPException:
+    return llm_http_error(exc, "Failed to process chat message")
 
 
 def _to_chat_response(chat) -> ChatResponse:
@@ -102,16 +118,18 @@ def get_history(
 
 
 @router.post("/{chat_id}/message", response_model=ChatMessagePipelineResponse)
-def post_message(
+async def post_message(
     chat_id: UUID,
     body: ChatMessageRequest,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User | None = Depends(get_optional_current_user),
 ):
+    filters = RetrievalFilters.build(**body.filter_kwargs())
     if not current_user:
         try:
-            guest = get_or_create_anonymous_user(db)
-            rag = query_rag(db, user_id=guest.id, question=body.content)
+            guest = await asyncio.to_thread(get_or_create_anonymous_user, db)
+            rag = await aquery_rag(db, user_id=guest.id, question=body.content, filters=filters)
             now = datetime.utcnow()
             return ChatMessagePipelineResponse(
                 user_message=ChatMessageResponse(
@@ -142,31 +160,93 @@ def post_message(
                 ),
             )
         except Exception as exc:
-            text = str(exc).lower()
-            if "insufficient_quota" in text or "rate limit" in text or "ratelimiterror" in text:
-                raise HTTPException(
-                    status_code=503,
-                    detail="AI service quota exceeded. Please add billing/credits for your OpenAI account.",
-                ) from exc
-            raise HTTPException(status_code=500, detail="Failed to process chat message") from exc
+            raise _chat_http_error(exc) from exc
+    context = PipelineContext(question=body.content)
     try:
-        user_msg, assistant_msg = process_chat_message(
+        user_msg, assistant_msg = await aprocess_chat_message(
             db,
             user_id=current_user.id,
             chat_id=chat_id,
             content=body.content,
+            context=context,
+            filters=filters,
         )
     except ValueError as exc:
         raise HTTPException(status_code=404, detail=str(exc)) from exc
     except Exception as exc:
-        text = str(exc).lower()
-        if "insufficient_quota" in text or "rate limit" in text or "ratelimiterror" in text:
-            raise HTTPException(
-                status_code=503,
-                detail="AI service quota exceeded. Please add billing/credits for your OpenAI account.",
-            ) from exc
-        raise HTTPException(status_code=500, detail="Failed to process chat message") from exc
+        raise _chat_http_error(exc) from exc
+    background_tasks.add_task(store_message_embedding, user_msg.id, context.query_embedding)
+    background_tasks.add_task(aupdate_chat_summary, chat_id)
     return ChatMessagePipelineResponse(
         user_message=_to_message_response(user_msg),
         assistant_message=_to_message_response(assistant_msg),
     )
+
+
+@router.post("/{chat_id}/message/stream")
+async def post_message_stream(
+    chat_id: UUID,
+    body: ChatMessageRequest,
+    db: Session = Depends(get_db),
+    current_user: User | None = Depends(get_optional_current_user),
+):
+    """Server-sent events: ``citations``, ``token`` deltas, then ``done`` with message ids.
+
+    The assistant message is stored once the stream completes.
+    """
+    filters = RetrievalFilters.build(**body.filter_kwargs())
+    context = PipelineContext(question=body.content)
+    user_msg_id = None
+    try:
+        if current_user:
+            user_msg, prepared = await astart_chat_message(
+                db,
+                user_id=current_user.id,
+                chat_id=chat_id,
+                content=body.content,
+                context=context,
+                filters=filters,
+            )
+            user_msg_id = user_msg.id
+        else:
+            guest = await asyncio.to_thread(get_or_create_anonymous_user, db)
+            prepared = await aprepare_query(
+                db,
+                user_id=guest.id,
+                question=body.content,
+                context=context,
+                filters=filters,
+            )
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    except Exception as exc:
+        raise _chat_http_error(exc) from exc
+
+    async def events():
+        citations = prepared.result.citations if prepared.result else prepared.citations
+        yield sse_event("citations", [asdict(c) for c in citations])
+        parts = []
+        try:
+            async for delta in astream_prepared(prepared):
+                parts.append(delta)
+                yield sse_event("token", {"text": delta})
+            rag = finish_prepared(prepared, "".join(parts))
+        except Exception as exc:
+            logger.error("Streaming chat message failed: %s", exc)
+            yield sse_event("error", {"detail": _chat_http_error(exc).detail})
+            return
+
+        done = {"answer": rag.answer, "confidence_score": rag.confidence_score}
+        if user_msg_id is not None:
+            assistant_id = await asyncio.to_thread(store_streamed_reply, chat_id=chat_id, rag=rag)
+            done.update(user_message_id=user_msg_id, assistant_message_id=assistant_id)
+        yield sse_event("done", done)
+
+    # Runs whatever the stream's outcome (provider error, client disconnect),
+    # so the stored question always gets its embedding for similar-turn memory.
+    background = None
+    if user_msg_id is not None:
+        background = BackgroundTasks()
+        background.add_task(store_message_embedding, user_msg_id, prepared.query_embedding)
+        background.add_task(aupdate_chat_summary, chat_id)
+    return sse_response(events(), background=background)
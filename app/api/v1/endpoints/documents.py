@@ -2,7 +2,7 @@
 
 import logging
 
-from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db
@@ -16,27 +16,16 @@ from app.schemas.document import (
     UploadResponse,
 )
 from app.services.document_service import create_document, get_document, list_documents, delete_document
-from app.services.ingestion_service import ingest_document
+from app.services.job_queue import enqueue_ingestion
 from app.services.user_service import get_or_create_anonymous_user
-from app.core.database import SessionLocal
 from app.auth.jwt import create_access_token
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 logger = logging.getLogger(__name__)
 
-def _run_ingestion(document_id: int) -> None:
-    local_db = SessionLocal()
-    try:
-        ingest_document(local_db, document_id)
-    except Exception:
-        logger.exception("Ingestion background task failed for document_id=%s", document_id)
-    finally:
-        local_db.close()
-
 
 @router.post("/upload", response_model=UploadResponse)
 async def upload_document(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_user: User | None = Depends(get_optional_current_user),
@@ -56,7 +45,8 @@ async def upload_document(
         file_type=file_type,
         file_bytes=content,
     )
-    background_tasks.add_task(_run_ingestion, document.id)
+    # Ingestion runs in the worker processes (python -m app.worker).
+    enqueue_ingestion(db, document.id)
     
     # If this is an anonymous user (no current_user), return a token for session continuity
     anonymous_token = None
@@ -65,7 +55,7 @@ async def upload_document(
     
     return UploadResponse(
         success=True,
-        message="File uploaded. Ingestion started.",
+        message="File uploaded. Ingestion queued.",
         document=DocumentResponse(id=document.id, filename=document.filename),
         anonymous_token=anonymous_token,
     )
@@ -74,7 +64,6 @@ async def upload_document(
 @router.post("/process")
 def process_document(
     payload: ProcessDocumentRequest,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User | None = Depends(get_optional_current_user),
 ):
@@ -83,8 +72,8 @@ def process_document(
     document = get_document(db, actor.id, document_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
-    background_tasks.add_task(_run_ingestion, document.id)
-    return {"success": True, "message": "Processing triggered", "document_id": document.id}
+    job = enqueue_ingestion(db, document.id)
+    return {"success": True, "message": "Processing queued", "document_id": document.id, "job_id": job.id}
 
 
 @router.get("", response_model=DocumentListResponse)
@@ -1,36 +1,57 @@
 """Direct RAG query endpoint (without chat persistence)."""
 
+import asyncio
+import logging
+from dataclasses import asdict
+
 from fastapi import APIRouter, Depends
 from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db
+from app.api.errors import llm_http_error
+from app.api.sse import sse_event, sse_response
 from app.auth.deps import get_optional_current_user
 from app.models import User
-from app.schemas.rag import RAGQueryRequest, RAGQueryResponse
-from app.services.rag_service import query_rag
+from app.schemas.rag import RAGBatchItem, RAGBatchQueryRequest, RAGQueryRequest, RAGQueryResponse
+from app.services.rag_service import (
+    aanswer_batch,
+    aprepare_batch,
+    aprepare_query,
+    aquery_rag,
+    astream_prepared,
+    finish_prepared,
+)
+from app.services.retrieval_service import RetrievalFilters
 from app.services.user_service import get_or_create_anonymous_user
 
 router = APIRouter(prefix="/rag", tags=["rag"])
+logger = logging.getLogger(__name__)
+
+
+def _rag_http_error(exc: Exception) -> HTTPException:
+    return llm_http_error(exc, "Failed to process RAG query")
 
 
 @router.post("/query", response_model=RAGQueryResponse)
-def rag_query(
+async def rag_query(
     body: RAGQueryRequest,
     db: Session = Depends(get_db),
     current_user: User | None = Depends(get_optional_current_user),
 ):
-    actor = current_user or get_or_create_anonymous_user(db)
+    actor = current_user or await asyncio.to_thread(get_or_create_anonymous_user, db)
     try:
-        result = query_rag(db, user_id=actor.id, question=body.question)
+        result = await aquery_rag(
+            db,
+            user_id=actor.id,
+            question=body.question,
+            filters=RetrievalFilters.build(**body.filter_kwargs()),
+            ef_search=body.ef_search,
+            iterative_scan=body.iterative_scan,
+        )
     except Exception as exc:
-        text = str(exc).lower()
-        if "insufficient_quota" in text or "rate limit" in text or "ratelimiterror" in text:
-            raise HTTPException(
-                status_code=503,
-                detail="AI service quota exceeded. Please add billing/credits for your OpenAI account.",
-            ) from exc
-        raise HTTPException(status_code=500, detail="Failed to process RAG query") from exc
+        raise _rag_http_error(exc) from exc
     return RAGQueryResponse(
         answer=result.answer,
         citations=[
@@ -46,3 +67,75 @@ def rag_query(
         ],
         confidence_score=result.confidence_score,
     )
+
+
+@router.post("/query/stream")
+async def rag_query_stream(
+    body: RAGQueryRequest,
+    db: Session = Depends(get_db),
+    current_user: User | None = Depends(get_optional_current_user),
+):
+    """Server-sent events: ``citations`` after retrieval, ``token`` deltas, then ``done``."""
+    actor = current_user or await asyncio.to_thread(get_or_create_anonymous_user, db)
+    # Retrieval runs before the response starts: the request session is
+    # closed by the time the stream body is iterated.
+    try:
+        prepared = await aprepare_query(
+            db,
+            user_id=actor.id,
+            question=body.question,
+            filters=RetrievalFilters.build(**body.filter_kwargs()),
+            ef_search=body.ef_search,
+            iterative_scan=body.iterative_scan,
+        )
+    except Exception as exc:
+        raise _rag_http_error(exc) from exc
+
+    async def events():
+        citations = prepared.result.citations if prepared.result else prepared.citations
+        yield sse_event("citations", [asdict(c) for c in citations])
+        parts = []
+        try:
+            async for delta in astream_prepared(prepared):
+                parts.append(delta)
+                yield sse_event("token", {"text": delta})
+            result = finish_prepared(prepared, "".join(parts))
+        except Exception as exc:
+            logger.error("Streaming RAG query failed: %s", exc)
+            yield sse_event("error", {"detail": _rag_http_error(exc).detail})
+            return
+        yield sse_event("done", {"answer": result.answer, "confidence_score": result.confidence_score})
+
+    return sse_response(events())
+
+
+@router.post("/query/batch")
+async def rag_query_batch(
+    body: RAGBatchQueryRequest,
+    db: Session = Depends(get_db),
+    current_user: User | None = Depends(get_optional_current_user),
+):
+    """Answer a checklist of questions; streams one RAGBatchItem JSON line per question, in order."""
+    actor = current_user or await asyncio.to_thread(get_or_create_anonymous_user, db)
+    try:
+        prepared = await aprepare_batch(db, user_id=actor.id, questions=body.questions)
+    except Exception as exc:
+        raise _rag_http_error(exc) from exc
+
+    async def stream():
+        async for idx, outcome in aanswer_batch(prepared):
+            question = prepared[idx].question
+            if isinstance(outcome, Exception):
+                logger.error("Batch RAG question %s failed: %s", idx, outcome)
+                item = RAGBatchItem(index=idx, question=question, error=_rag_http_error(outcome).detail)
+            else:
+                item = RAGBatchItem(
+                    index=idx,
+                    question=question,
+                    answer=outcome.answer,
+                    citations=[asdict(c) for c in outcome.citations],
+                    confidence_score=outcome.confidence_score,
+                )
+            yield item.model_dump_json() + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -12,6 +12,10 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() in {"1", "true", "yes", "on"}
+
+
 class Settings:
     """Runtime configuration for the personal RAG backend."""
 
@@ -49,12 +53,145 @@ class Settings:
     EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
     ANTHROPIC_API_KEY: str = os.getenv("ANTHROPIC_API_KEY", "")
     ANTHROPIC_MODEL: str = os.getenv("ANTHROPIC_MODEL", "claude-3-5-sonnet-20241022")
+    # Anthropic cache_control breakpoints on the system prompt and retrieved context
+    PROMPT_CACHE_ENABLED: bool = _env_bool("PROMPT_CACHE_ENABLED", "true")
+    # Provider routing: failover order, latency budgets, hedging, circuit breakers
+    LLM_FALLBACK_PROVIDERS: str = os.getenv("LLM_FALLBACK_PROVIDERS", "")
+    OPENAI_LATENCY_BUDGET_SECONDS: float = float(os.getenv("OPENAI_LATENCY_BUDGET_SECONDS", "30"))
+    ANTHROPIC_LATENCY_BUDGET_SECONDS: float = float(os.getenv("ANTHROPIC_LATENCY_BUDGET_SECONDS", "30"))
+    LLM_HEDGE_ENABLED: bool = _env_bool("LLM_HEDGE_ENABLED", "false")
+    LLM_HEDGE_MIN_DELAY_SECONDS: float = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "2"))
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5"))
+    LLM_CIRCUIT_RESET_SECONDS: float = float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "30"))
+    # Shared outbound rate limits per provider (0 = unlimited); embeddings and
+    # answers draw from the same buckets, ingestion leaves a reserve for queries.
+    RATE_LIMIT_ENABLED: bool = _env_bool("RATE_LIMIT_ENABLED", "true")
+    OPENAI_REQUESTS_PER_MINUTE: int = int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "3000"))
+    OPENAI_TOKENS_PER_MINUTE: int = int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "1000000"))
+    ANTHROPIC_REQUESTS_PER_MINUTE: int = int(os.getenv("ANTHROPIC_REQUESTS_PER_MINUTE", "1000"))
+    ANTHROPIC_TOKENS_PER_MINUTE: int = int(os.getenv("ANTHROPIC_TOKENS_PER_MINUTE", "400000"))
+    RATE_LIMIT_INTERACTIVE_RESERVE: float = float(os.getenv("RATE_LIMIT_INTERACTIVE_RESERVE", "0.2"))
+    RATE_LIMIT_BACKOFF_SECONDS: float = float(os.getenv("RATE_LIMIT_BACKOFF_SECONDS", "1.0"))
+
+    # Ingestion job queue (ingestion_jobs table) and the worker processes (python -m app.worker)
+    INGESTION_WORKER_CONCURRENCY: int = int(os.getenv("INGESTION_WORKER_CONCURRENCY", "2"))
+    INGESTION_POLL_SECONDS: float = float(os.getenv("INGESTION_POLL_SECONDS", "1.0"))
+    INGESTION_VISIBILITY_TIMEOUT_SECONDS: float = float(
+        os.getenv("INGESTION_VISIBILITY_TIMEOUT_SECONDS", "300")
+    )
+    INGESTION_MAX_ATTEMPTS: int = int(os.getenv("INGESTION_MAX_ATTEMPTS", "5"))
+    INGESTION_RETRY_BASE_SECONDS: float = float(os.getenv("INGESTION_RETRY_BASE_SECONDS", "10"))
+    INGESTION_RETRY_MAX_SECONDS: float = float(os.getenv("INGESTION_RETRY_MAX_SECONDS", "600"))
+    # Rate limits for all worker processes together, split evenly across
+    # INGESTION_WORKER_PROCESSES; the API's own limits should leave this room.
+    INGESTION_WORKER_PROCESSES: int = int(os.getenv("INGESTION_WORKER_PROCESSES", "1"))
+    INGESTION_OPENAI_REQUESTS_PER_MINUTE: int = int(os.getenv("INGESTION_OPENAI_REQUESTS_PER_MINUTE", "600"))
+    INGESTION_OPENAI_TOKENS_PER_MINUTE: int = int(os.getenv("INGESTION_OPENAI_TOKENS_PER_MINUTE", "200000"))
+    INGESTION_ANTHROPIC_REQUESTS_PER_MINUTE: int = int(
+        os.getenv("INGESTION_ANTHROPIC_REQUESTS_PER_MINUTE", "200")
+    )
+    INGESTION_ANTHROPIC_TOKENS_PER_MINUTE: int = int(
+        os.getenv("INGESTION_ANTHROPIC_TOKENS_PER_MINUTE", "80000")
+    )
+
+    # Embedding provider: openai (remote) or local (in-process hashed n-gram projection)
+    EMBEDDING_PROVIDER: str = os.getenv("EMBEDDING_PROVIDER", "openai").lower()
+    OPENAI_EMBEDDING_DIM: int = int(os.getenv("OPENAI_EMBEDDING_DIM", "1536"))
+    LOCAL_EMBEDDING_DIM: int = int(os.getenv("LOCAL_EMBEDDING_DIM", "384"))
+
+    @property
+    def EMBEDDING_DIM(self) -> int:
+        """Vector dimension of the configured embedding provider."""
+        if self.EMBEDDING_PROVIDER == "local":
+            return self.LOCAL_EMBEDDING_DIM
+        return self.OPENAI_EMBEDDING_DIM
+
+    # Shared provider HTTP clients (connection pooling / keep-alive)
+    LLM_HTTP_MAX_CONNECTIONS: int = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100"))
+    LLM_HTTP_MAX_KEEPALIVE: int = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20"))
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "30"))
+    LLM_HTTP_TIMEOUT: float = float(os.getenv("LLM_HTTP_TIMEOUT", "60"))
+    LLM_HTTP_CONNECT_TIMEOUT: float = float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT", "10"))
+    LLM_HTTP2: bool = _env_bool("LLM_HTTP2", "true")
+    # SDK-level retries for answer calls; embedding batches use EMBEDDING_MAX_RETRIES only
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "2"))
+
+    # Embedding batching (per-request limits and parallel requests)
+    EMBEDDING_BATCH_MAX_ITEMS: int = int(os.getenv("EMBEDDING_BATCH_MAX_ITEMS", "256"))
+    EMBEDDING_BATCH_MAX_TOKENS: int = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "100000"))
+    EMBEDDING_CONCURRENCY: int = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+    EMBEDDING_MAX_RETRIES: int = int(os.getenv("EMBEDDING_MAX_RETRIES", "3"))
+    EMBEDDING_RETRY_BASE_DELAY: float = float(os.getenv("EMBEDDING_RETRY_BASE_DELAY", "1.0"))
+
+    # Embedding cache (in-process LRU backed by the embedding_cache table)
+    EMBEDDING_CACHE_ENABLED: bool = _env_bool("EMBEDDING_CACHE_ENABLED", "true")
+    EMBEDDING_CACHE_MAX_ITEMS: int = int(os.getenv("EMBEDDING_CACHE_MAX_ITEMS", "5000"))
+    EMBEDDING_CACHE_PERSIST: bool = _env_bool("EMBEDDING_CACHE_PERSIST", "true")
 
     # RAG tuning
     CHUNK_SIZE: int = int(os.getenv("CHUNK_SIZE", "1000"))  # approximate tokens
     CHUNK_OVERLAP: int = int(os.getenv("CHUNK_OVERLAP", "200"))  # approximate tokens
     TOP_K: int = int(os.getenv("TOP_K", "5"))
+    # Vector index: full (vector HNSW), halfvec (float16 HNSW) or binary (bit HNSW);
+    # compact modes over-fetch RERANK_FACTOR * k candidates and re-rank on full vectors.
+    VECTOR_INDEX_MODE: str = os.getenv("VECTOR_INDEX_MODE", "full").lower()
+    RERANK_FACTOR: int = int(os.getenv("RERANK_FACTOR", "4"))
+    # Tenant-aware HNSW scans (hnsw.* settings need pgvector 0.8+ for iterative scans)
+    HNSW_EF_SEARCH: int = int(os.getenv("HNSW_EF_SEARCH", "0"))  # 0 = server default
+    HNSW_ITERATIVE_SCAN: str = os.getenv("HNSW_ITERATIVE_SCAN", "off").lower()
+    HNSW_MAX_SCAN_TUPLES: int = int(os.getenv("HNSW_MAX_SCAN_TUPLES", "0"))
+    TENANT_INDEX_MIN_CHUNKS: int = int(os.getenv("TENANT_INDEX_MIN_CHUNKS", "0"))  # 0 = disabled
+    # Opt-in process-local NumPy index for users with small corpora
+    NUMPY_INDEX_ENABLED: bool = _env_bool("NUMPY_INDEX_ENABLED", "false")
+    NUMPY_INDEX_MAX_CHUNKS: int = int(os.getenv("NUMPY_INDEX_MAX_CHUNKS", "20000"))
+    NUMPY_INDEX_MAX_BYTES: int = int(os.getenv("NUMPY_INDEX_MAX_BYTES", str(512 * 1024 * 1024)))
+    # Semantic answer cache (per user, invalidated by corpus version)
+    ANSWER_CACHE_ENABLED: bool = _env_bool("ANSWER_CACHE_ENABLED", "true")
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.97"))
+    ANSWER_CACHE_TTL_SECONDS: float = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+    ANSWER_CACHE_MAX_USERS: int = int(os.getenv("ANSWER_CACHE_MAX_USERS", "1000"))
+    ANSWER_CACHE_MAX_PER_USER: int = int(os.getenv("ANSWER_CACHE_MAX_PER_USER", "64"))
+    # Hybrid retrieval: full-text + vector lists merged with reciprocal rank fusion
+    HYBRID_SEARCH_ENABLED: bool = _env_bool("HYBRID_SEARCH_ENABLED", "true")
+    HYBRID_VECTOR_WEIGHT: float = float(os.getenv("HYBRID_VECTOR_WEIGHT", "1.0"))
+    HYBRID_LEXICAL_WEIGHT: float = float(os.getenv("HYBRID_LEXICAL_WEIGHT", "1.0"))
+    HYBRID_CANDIDATES: int = int(os.getenv("HYBRID_CANDIDATES", "40"))
+    RRF_K: int = int(os.getenv("RRF_K", "60"))
+    # Document-filtered searches over at most this many chunks skip the ANN index
+    FILTER_EXACT_SCAN_MAX_CHUNKS: int = int(os.getenv("FILTER_EXACT_SCAN_MAX_CHUNKS", "20000"))
+    # Diversification of retrieved chunks: mmr, dedup (near-duplicate removal only) or off
+    DIVERSITY_MODE: str = os.getenv("DIVERSITY_MODE", "mmr").lower()
+    DIVERSITY_FETCH_FACTOR: int = int(os.getenv("DIVERSITY_FETCH_FACTOR", "3"))
+    MMR_LAMBDA: float = float(os.getenv("MMR_LAMBDA", "0.7"))
+    DEDUP_SIMILARITY_THRESHOLD: float = float(os.getenv("DEDUP_SIMILARITY_THRESHOLD", "0.9"))
+    # Skip the LLM when the best chunk is below this cosine similarity (0 = never);
+    # calibrate per embedding model.
+    RETRIEVAL_MIN_SIMILARITY: float = float(os.getenv("RETRIEVAL_MIN_SIMILARITY", "0.2"))
+    # Cut the top-k at the largest similarity drop-off between ranked chunks
+    ADAPTIVE_TOP_K_ENABLED: bool = _env_bool("ADAPTIVE_TOP_K_ENABLED", "true")
+    ADAPTIVE_TOP_K_MIN: int = int(os.getenv("ADAPTIVE_TOP_K_MIN", "2"))
+    ADAPTIVE_TOP_K_MIN_GAP: float = float(os.getenv("ADAPTIVE_TOP_K_MIN_GAP", "0.1"))
     MAX_CHAT_MEMORY_MESSAGES: int = int(os.getenv("MAX_CHAT_MEMORY_MESSAGES", "16"))
+    # Chat memory = last N messages + earlier turns most similar to the question
+    CHAT_MEMORY_RECENT_MESSAGES: int = int(os.getenv("CHAT_MEMORY_RECENT_MESSAGES", "6"))
+    CHAT_MEMORY_SIMILAR_TURNS: int = int(os.getenv("CHAT_MEMORY_SIMILAR_TURNS", "3"))
+    CHAT_MEMORY_TOKEN_BUDGET: int = int(os.getenv("CHAT_MEMORY_TOKEN_BUDGET", "1500"))  # 0 = unlimited
+    # Rolling chat summary: messages older than the last CHAT_SUMMARY_RECENT_MESSAGES
+    # are folded into chats.summary in the background after each exchange.
+    CHAT_SUMMARY_ENABLED: bool = _env_bool("CHAT_SUMMARY_ENABLED", "true")
+    CHAT_SUMMARY_RECENT_MESSAGES: int = int(os.getenv("CHAT_SUMMARY_RECENT_MESSAGES", "4"))
+    CHAT_SUMMARY_MIN_MESSAGES: int = int(os.getenv("CHAT_SUMMARY_MIN_MESSAGES", "2"))
+    CHAT_SUMMARY_MAX_TOKENS: int = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "400"))
+    # Prompt token budget for retrieved context + memory (0 = unlimited);
+    # overrides are "model=tokens,model=tokens".
+    OPENAI_CONTEXT_TOKEN_BUDGET: int = int(os.getenv("OPENAI_CONTEXT_TOKEN_BUDGET", "6000"))
+    ANTHROPIC_CONTEXT_TOKEN_BUDGET: int = int(os.getenv("ANTHROPIC_CONTEXT_TOKEN_BUDGET", "6000"))
+    CONTEXT_TOKEN_BUDGET_OVERRIDES: str = os.getenv("CONTEXT_TOKEN_BUDGET_OVERRIDES", "")
+    MEMORY_TOKEN_SHARE: float = float(os.getenv("MEMORY_TOKEN_SHARE", "0.25"))
+    # Identical concurrent queries (user, question, chat memory) share one computation
+    SINGLE_FLIGHT_ENABLED: bool = _env_bool("SINGLE_FLIGHT_ENABLED", "true")
+    RAG_BATCH_MAX_QUESTIONS: int = int(os.getenv("RAG_BATCH_MAX_QUESTIONS", "200"))
+    RAG_BATCH_CONCURRENCY: int = int(os.getenv("RAG_BATCH_CONCURRENCY", "4"))
 
 
 @lru_cache
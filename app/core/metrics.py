@@ -0,0 +1,33 @@
+"""In-process counters for caches and pipeline stages."""
+
+from __future__ import annotations
+
+import threading
+from collections import Counter
+
+_lock = threading.Lock()
+_counters: Counter[str] = Counter()
+
+
+def incr(name: str, value: int = 1) -> None:
+    """Increment a named counter."""
+    with _lock:
+        _counters[name] += value
+
+
+def get(name: str) -> int:
+    with _lock:
+        return _counters[name]
+
+
+def snapshot() -> dict[str, int]:
+    """Return a copy of all counters, sorted by name."""
+    with _lock:
+        return dict(sorted(_counters.items()))
+
+
+def ratio(numerator: str, denominator: str) -> float:
+    """Return numerator/denominator for two counters (0.0 when empty)."""
+    with _lock:
+        total = _counters[denominator]
+        return round(_counters[numerator] / total, 4) if total else 0.0
@@ -10,9 +10,30 @@ from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy import text
 
 from app.api.v1.router import api_router
+from app.core import metrics
 from app.core.config import settings
-from app.core.database import Base, engine
-from app.models import Chat, ChatMessage, Document, DocumentChunk, Feedback, User  # noqa: F401
+from app.core.database import Base, SessionLocal, engine
+from app.models import (  # noqa: F401
+    Chat,
+    ChatMessage,
+    Document,
+    DocumentChunk,
+    EmbeddingCacheEntry,
+    Feedback,
+    IngestionJob,
+    User,
+)
+from app.models.document_chunk import TSVECTOR_CONFIG
+from app.services.answer_cache import answer_cache_stats
+from app.services.embedding_cache import cache_stats
+from app.services.llm_clients import close_clients
+from app.services.llm_router import router_stats
+from app.services.job_queue import queue_stats
+from app.services.llm_usage import prompt_cache_stats
+from app.services.rag_service import rag_stats
+from app.services.rate_limiter import rate_limit_stats
+from app.services.retrieval_service import ann_index_statement
+from app.services.vector_index_cache import index_stats
 
 logging.basicConfig(
     level=logging.INFO,
@@ -21,6 +42,24 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def _check_embedding_dimension(conn) -> None:
+    """Warn when the stored vector column no longer matches the embedding provider."""
+    stored_dim = conn.execute(
+        text(
+            "SELECT atttypmod FROM pg_attribute "
+            "WHERE attrelid = 'document_chunks'::regclass AND attname = 'embedding'"
+        )
+    ).scalar()
+    if stored_dim and stored_dim > 0 and stored_dim != settings.EMBEDDING_DIM:
+        logger.error(
+            "document_chunks.embedding is vector(%s) but EMBEDDING_PROVIDER=%s produces %s dims; "
+            "recreate the embedding columns and re-ingest documents.",
+            stored_dim,
+            settings.EMBEDDING_PROVIDER,
+            settings.EMBEDDING_DIM,
+        )
+
+
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     logger.info("Starting backend...")
@@ -30,16 +69,61 @@ async def lifespan(_: FastAPI):
             conn.commit()
         Base.metadata.create_all(bind=engine)
         with engine.connect() as conn:
+            _check_embedding_dimension(conn)
+            conn.execute(text(ann_index_statement()))
             conn.execute(
                 text(
-                    "CREATE INDEX IF NOT EXISTS ix_document_chunks_embedding_hnsw "
-                    "ON document_chunks USING hnsw (embedding vector_cosine_ops)"
+                    "CREATE INDEX IF NOT EXISTS ix_document_chunks_user_id "
+                    "ON document_chunks (user_id)"
                 )
             )
             conn.execute(
                 text(
-                    "CREATE INDEX IF NOT EXISTS ix_document_chunks_user_id "
-                    "ON document_chunks (user_id)"
+                    "ALTER TABLE users ADD COLUMN IF NOT EXISTS corpus_version "
+                    "integer NOT NULL DEFAULT 0"
+                )
+            )
+            conn.execute(text("ALTER TABLE chats ADD COLUMN IF NOT EXISTS summary text"))
+            conn.execute(text("ALTER TABLE chats ADD COLUMN IF NOT EXISTS summary_until timestamp"))
+            conn.execute(
+                text(
+                    "ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS chunk_tsv tsvector "
+                    f"GENERATED ALWAYS AS (to_tsvector('{TSVECTOR_CONFIG}', chunk_text)) STORED"
+                )
+            )
+            conn.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS ix_document_chunks_chunk_tsv "
+                    "ON document_chunks USING gin (chunk_tsv)"
+                )
+            )
+            # Similar chat turns are ranked exactly within one chat; a global
+            # HNSW index over every chat's messages only slowed down inserts.
+            conn.execute(text("DROP INDEX IF EXISTS ix_chat_messages_embedding_hnsw"))
+            # Document-scoped retrieval: resolve filters on documents, then
+            # reach the chunks of the matching documents through a btree.
+            conn.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS ix_document_chunks_user_document "
+                    "ON document_chunks (user_id, document_id)"
+                )
+            )
+            conn.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS ix_documents_user_created_at "
+                    "ON documents (user_id, created_at)"
+                )
+            )
+            conn.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS ix_documents_user_file_type "
+                    "ON documents (user_id, lower(file_type))"
+                )
+            )
+            conn.execute(
+                text(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS ix_ingestion_jobs_active_document "
+                    "ON ingestion_jobs (document_id) WHERE status IN ('queued', 'running')"
                 )
             )
             conn.commit()
@@ -47,6 +131,7 @@ async def lifespan(_: FastAPI):
     except Exception as exc:
         logger.exception("Startup DB initialization failed: %s", exc)
     yield
+    await close_clients()
     logger.info("Shutting down backend.")
 
 
@@ -70,3 +155,21 @@ app.include_router(api_router, prefix=settings.API_V1_PREFIX)
 @app.get("/health")
 def health():
     return {"status": "ok"}
+
+
+@app.get("/stats")
+def stats():
+    """Process-local cache and pipeline counters, plus the shared ingestion queue depth."""
+    with SessionLocal() as db:
+        ingestion_queue = queue_stats(db)
+    return {
+        "embedding_cache": cache_stats(),
+        "numpy_index": index_stats(),
+        "answer_cache": answer_cache_stats(),
+        "prompt_cache": prompt_cache_stats(),
+        "llm_providers": router_stats(),
+        "rag": rag_stats(),
+        "rate_limits": rate_limit_stats(),
+        "ingestion_queue": ingestion_queue,
+        "counters": metrics.snapshot(),
+    }
@@ -7,6 +7,8 @@ from app.models.chunk import Chunk
 from app.models.chat import Chat
 from app.models.chat_message import ChatMessage
 from app.models.feedback import Feedback
+from app.models.embedding_cache import EmbeddingCacheEntry
+from app.models.ingestion_job import IngestionJob
 
 __all__ = [
     "User",
@@ -16,4 +18,6 @@ __all__ = [
     "Chat",
     "ChatMessage",
     "Feedback",
+    "EmbeddingCacheEntry",
+    "IngestionJob",
 ]
@@ -3,7 +3,7 @@
 from datetime import datetime
 from uuid import uuid4
 
-from sqlalchemy import Column, DateTime, ForeignKey, String
+from sqlalchemy import Column, DateTime, ForeignKey, String, Text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -17,6 +17,9 @@ class Chat(Base):
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
     title = Column(String(255), nullable=False, default="New chat")
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # Rolling summary of every message created up to summary_until.
+    summary = Column(Text, nullable=True)
+    summary_until = Column(DateTime, nullable=True)
 
     user = relationship("User", back_populates="chats")
     messages = relationship(
@@ -6,7 +6,7 @@ from uuid import uuid4
 from pgvector.sqlalchemy import Vector
 from sqlalchemy import Column, DateTime, ForeignKey, String, Text
 from sqlalchemy.dialects.postgresql import JSONB, UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 
 from app.core.database import Base
 from app.models.document_chunk import EMBEDDING_DIM
@@ -19,7 +19,8 @@ class ChatMessage(Base):
     chat_id = Column(UUID(as_uuid=True), ForeignKey("chats.id"), nullable=False, index=True)
     role = Column(String(20), nullable=False)  # user | assistant | system
     content = Column(Text, nullable=False)
-    embedding = Column(Vector(EMBEDDING_DIM), nullable=True)
+    # Deferred: loaded only when accessed, so entity queries never ship vectors.
+    embedding = deferred(Column(Vector(EMBEDDING_DIM), nullable=True))
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     metadata_json = Column(JSONB, nullable=True)
 
@@ -1,13 +1,15 @@
 """Vectorized document chunks for retrieval."""
 
 from pgvector.sqlalchemy import Vector
-from sqlalchemy import Column, ForeignKey, Integer, String, Text
-from sqlalchemy.dialects.postgresql import JSONB, UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Computed, ForeignKey, Integer, String, Text
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR, UUID
+from sqlalchemy.orm import deferred, relationship
 
+from app.core.config import settings
 from app.core.database import Base
 
-EMBEDDING_DIM = 1536
+EMBEDDING_DIM = settings.EMBEDDING_DIM
+TSVECTOR_CONFIG = "english"
 
 
 class DocumentChunk(Base):
@@ -17,10 +19,15 @@ class DocumentChunk(Base):
     document_id = Column(Integer, ForeignKey("documents.id"), nullable=False, index=True)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
     chunk_text = Column(Text, nullable=False)
-    embedding = Column(Vector(EMBEDDING_DIM), nullable=True)
+    # Deferred: loaded only when accessed, so entity queries never ship vectors.
+    embedding = deferred(Column(Vector(EMBEDDING_DIM), nullable=True))
     page_number = Column(Integer, nullable=False, default=1)
     section = Column(String(255), nullable=True)
     token_count = Column(Integer, nullable=False, default=0)
     metadata_json = Column(JSONB, nullable=True)
+    # Generated full-text vector for lexical/hybrid search (GIN-indexed at startup).
+    chunk_tsv = deferred(
+        Column(TSVECTOR, Computed(f"to_tsvector('{TSVECTOR_CONFIG}', chunk_text)", persisted=True))
+    )
 
     document = relationship("Document", back_populates="chunks")
@@ -0,0 +1,17 @@
+"""Persistent embedding cache keyed by model + content hash."""
+
+from datetime import datetime
+
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import Column, DateTime, String
+
+from app.core.database import Base
+
+
+class EmbeddingCacheEntry(Base):
+    __tablename__ = "embedding_cache"
+
+    model = Column(String(100), primary_key=True)
+    content_hash = Column(String(64), primary_key=True)  # sha256 hex of the input text
+    embedding = Column(Vector(), nullable=False)  # dimension varies per model
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
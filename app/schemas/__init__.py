@@ -17,7 +17,13 @@ from app.schemas.document import (
     UploadResponse,
 )
 from app.schemas.feedback import FeedbackRequest, FeedbackResponse
-from app.schemas.rag import RAGQueryRequest, RAGQueryResponse
+from app.schemas.rag import (
+    RAGBatchItem,
+    RAGBatchQueryRequest,
+    RAGQueryRequest,
+    RAGQueryResponse,
+    RetrievalFilterFields,
+)
 
 __all__ = [
     "RegisterRequest",
@@ -37,6 +43,9 @@ __all__ = [
     "ChatMessagePipelineResponse",
     "RAGQueryRequest",
     "RAGQueryResponse",
+    "RAGBatchQueryRequest",
+    "RAGBatchItem",
+    "RetrievalFilterFields",
     "FeedbackRequest",
     "FeedbackResponse",
 ]
@@ -5,6 +5,8 @@ from uuid import UUID
 
 from pydantic import BaseModel, Field
 
+from app.schemas.rag import RetrievalFilterFields
+
 
 class CreateChatRequest(BaseModel):
     title: str = Field(default="New chat", min_length=1, max_length=255)
@@ -25,7 +27,7 @@ class MessageCitation(BaseModel):
     snippet: str
 
 
-class ChatMessageRequest(BaseModel):
+class ChatMessageRequest(RetrievalFilterFields):
     content: str = Field(..., min_length=1)
 
 
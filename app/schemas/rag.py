@@ -1,10 +1,35 @@
 """RAG query response schemas."""
 
-from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Literal
 
+from pydantic import BaseModel, Field, field_validator
 
-class RAGQueryRequest(BaseModel):
+from app.core.config import settings
+
+
+class RetrievalFilterFields(BaseModel):
+    """Optional restriction of retrieval to some of the user's documents."""
+
+    document_ids: list[int] | None = Field(default=None, max_length=1000)
+    file_types: list[str] | None = None
+    uploaded_after: datetime | None = None
+    uploaded_before: datetime | None = None
+
+    def filter_kwargs(self) -> dict:
+        return {
+            "document_ids": self.document_ids,
+            "file_types": self.file_types,
+            "uploaded_after": self.uploaded_after,
+            "uploaded_before": self.uploaded_before,
+        }
+
+
+class RAGQueryRequest(RetrievalFilterFields):
     question: str = Field(..., min_length=1)
+    # Per-query HNSW overrides of HNSW_EF_SEARCH / HNSW_ITERATIVE_SCAN.
+    ef_search: int | None = Field(default=None, ge=1, le=1000)
+    iterative_scan: Literal["off", "strict_order", "relaxed_order"] | None = None
 
 
 class RAGCitation(BaseModel):
@@ -20,3 +45,27 @@ class RAGQueryResponse(BaseModel):
     answer: str
     citations: list[RAGCitation]
     confidence_score: float
+
+
+class RAGBatchQueryRequest(BaseModel):
+    questions: list[str] = Field(..., min_length=1)
+
+    @field_validator("questions")
+    @classmethod
+    def questions_must_be_valid(cls, v: list[str]) -> list[str]:
+        if len(v) > settings.RAG_BATCH_MAX_QUESTIONS:
+            raise ValueError(f"At most {settings.RAG_BATCH_MAX_QUESTIONS} questions per batch")
+        if any(not q.strip() for q in v):
+            raise ValueError("Questions must not be empty")
+        return v
+
+
+class RAGBatchItem(BaseModel):
+    """One NDJSON line of POST /rag/query/batch, emitted in question order."""
+
+    index: int
+    question: str
+    answer: str | None = None
+    citations: list[RAGCitation] = []
+    confidence_score: float | None = None
+    error: str | None = None
@@ -0,0 +1,132 @@
+"""Semantic cache of RAG answers, matched by question-embedding similarity."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+from uuid import UUID
+
+import numpy as np
+
+from app.core import metrics
+from app.core.config import settings
+
+
+@dataclass
+class _Entry:
+    embedding: np.ndarray
+    corpus_version: int
+    scope: str
+    result: Any
+    created_at: float
+
+
+def scope_key(**parts) -> str:
+    """Hash everything besides the question that shapes the answer (memory, k, ...)."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _normalize(embedding: list[float]) -> np.ndarray:
+    vec = np.asarray(embedding, dtype=np.float32)
+    return vec / max(float(np.linalg.norm(vec)), 1e-12)
+
+
+class SemanticAnswerCache:
+    """Per-user answer lists, LRU-bounded by user count and entries per user."""
+
+    def __init__(self, max_users: int, max_per_user: int, ttl_seconds: float, threshold: float):
+        self.max_users = max_users
+        self.max_per_user = max_per_user
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._users: OrderedDict[UUID, list[_Entry]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, user_id: UUID, embedding: list[float], corpus_version: int, scope: str):
+        metrics.incr("answer_cache.lookups")
+        query = _normalize(embedding)
+        now = time.monotonic()
+        with self._lock:
+            entries = self._users.get(user_id)
+            if not entries:
+                return None
+            live = [
+                e
+                for e in entries
+                if e.corpus_version == corpus_version and now - e.created_at <= self.ttl_seconds
+            ]
+            self._users[user_id] = live
+            self._users.move_to_end(user_id)
+            candidates = [e for e in live if e.scope == scope]
+            if not candidates:
+                return None
+            sims = np.stack([e.embedding for e in candidates]) @ query
+            best = int(np.argmax(sims))
+            if float(sims[best]) < self.threshold:
+                return None
+        metrics.incr("answer_cache.hits")
+        return candidates[best].result
+
+    def store(self, user_id: UUID, embedding: list[float], corpus_version: int, scope: str, result) -> None:
+        entry = _Entry(
+            embedding=_normalize(embedding),
+            corpus_version=corpus_version,
+            scope=scope,
+            result=result,
+            created_at=time.monotonic(),
+        )
+        with self._lock:
+            entries = self._users.setdefault(user_id, [])
+            entries.append(entry)
+            del entries[: max(0, len(entries) - self.max_per_user)]
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+    def invalidate_user(self, user_id: UUID) -> None:
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = sum(len(v) for v in self._users.values())
+        return {
+            "users": len(self._users),
+            "entries": entries,
+            "lookups": metrics.get("answer_cache.lookups"),
+            "hits": metrics.get("answer_cache.hits"),
+            "hit_rate": metrics.ratio("answer_cache.hits", "answer_cache.lookups"),
+        }
+
+
+_cache = SemanticAnswerCache(
+    max_users=settings.ANSWER_CACHE_MAX_USERS,
+    max_per_user=settings.ANSWER_CACHE_MAX_PER_USER,
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+    threshold=settings.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+)
+
+
+def lookup(user_id: UUID, embedding: list[float], corpus_version: int, scope: str):
+    if not settings.ANSWER_CACHE_ENABLED:
+        return None
+    return _cache.lookup(user_id, embedding, corpus_version, scope)
+
+
+def store(user_id: UUID, embedding: list[float], corpus_version: int, scope: str, result) -> None:
+    if settings.ANSWER_CACHE_ENABLED:
+        _cache.store(user_id, embedding, corpus_version, scope, result)
+
+
+def invalidate_user(user_id: UUID) -> None:
+    _cache.invalidate_user(user_id)
+
+
+def answer_cache_stats() -> dict:
+    return _cache.stats()
@@ -2,13 +2,29 @@
 
 from __future__ import annotations
 
+import asyncio
+import logging
 from uuid import UUID
 
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
+from app.core.database import SessionLocal
 from app.models import Chat, ChatMessage
-from app.services.embedding_service import get_embedding
-from app.services.rag_service import query_rag
+from app.services.llm_prompts import SUMMARY_SYSTEM_PROMPT, format_summary_request
+from app.services.llm_service import acomplete_text, complete_text
+from app.services.pipeline_context import PipelineContext
+from app.services.rag_service import (
+    PreparedQuery,
+    RAGResult,
+    aquery_rag,
+    prepare_query,
+    query_rag,
+)
+from app.services.rate_limiter import background_priority
+from app.services.retrieval_service import RetrievalFilters
+
+logger = logging.getLogger(__name__)
 
 
 def create_chat(db: Session, *, user_id: UUID, title: str) -> Chat:
@@ -39,45 +55,258 @@ def get_chat_messages(db: Session, *, user_id: UUID, chat_id) -> list[ChatMessag
     )
 
 
-def process_chat_message(db: Session, *, user_id: UUID, chat_id, content: str):
+def store_message_embedding(message_id: UUID, embedding: list[float]) -> None:
+    """Persist a message embedding outside the request (deferred write)."""
+    db = SessionLocal()
+    try:
+        db.query(ChatMessage).filter(ChatMessage.id == message_id).update(
+            {ChatMessage.embedding: embedding}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _pending_summary(chat_id):
+    """(summary, summary_until, messages to fold in), or None if there is too little to summarise."""
+    db = SessionLocal()
+    try:
+        chat = db.query(Chat.summary, Chat.summary_until).filter(Chat.id == chat_id).first()
+        if chat is None:
+            return None
+        query = db.query(ChatMessage.role, ChatMessage.content, ChatMessage.created_at).filter(
+            ChatMessage.chat_id == chat_id
+        )
+        if chat.summary_until is not None:
+            query = query.filter(ChatMessage.created_at > chat.summary_until)
+        rows = query.order_by(ChatMessage.created_at).all()
+    finally:
+        db.close()
+    pending = rows[: max(0, len(rows) - settings.CHAT_SUMMARY_RECENT_MESSAGES)]
+    if len(pending) < settings.CHAT_SUMMARY_MIN_MESSAGES:
+        return None
+    return chat.summary, chat.summary_until, pending
+
+
+def _summary_request(summary: str | None, pending: list) -> dict:
+    return {
+        "system": SUMMARY_SYSTEM_PROMPT.format(max_words=settings.CHAT_SUMMARY_MAX_TOKENS * 3 // 4),
+        "prompt": format_summary_request(summary, [{"role": r.role, "content": r.content} for r in pending]),
+        "max_tokens": settings.CHAT_SUMMARY_MAX_TOKENS,
+    }
+
+
+def _store_summary(chat_id, previous_until, summary: str, until) -> None:
+    """Compare-and-set on summary_until: a concurrent update that landed first wins."""
+    db = SessionLocal()
+    try:
+        updated = (
+            db.query(Chat)
+            .filter(Chat.id == chat_id, Chat.summary_until.is_not_distinct_from(previous_until))
+            .update({Chat.summary: summary.strip(), Chat.summary_until: until}, synchronize_session=False)
+        )
+        db.commit()
+    finally:
+        db.close()
+    if not updated:
+        logger.debug("Chat summary for chat_id=%s was updated concurrently; discarded", chat_id)
+
+
+def update_chat_summary(chat_id) -> None:
+    """Fold messages that have left the recent window into the chat's rolling summary.
+
+    No lock or connection is held during the LLM call: the new summary is
+    written with a compare-and-set on summary_until, so of two overlapping
+    updates for one chat only the first lands; messages it did not cover are
+    folded in by the next update.
+    """
+    if not settings.CHAT_SUMMARY_ENABLED:
+        return
+    try:
+        state = _pending_summary(chat_id)
+        if state is None:
+            return
+        summary, summary_until, pending = state
+        with background_priority():
+            text = complete_text(**_summary_request(summary, pending))
+        _store_summary(chat_id, summary_until, text, pending[-1].created_at)
+    except Exception:
+        logger.warning("Chat summary update failed for chat_id=%s", chat_id, exc_info=True)
+
+
+async def aupdate_chat_summary(chat_id) -> None:
+    """Async update_chat_summary, run after each exchange: the completion awaits the
+    async clients, so it does not hold a threadpool thread for the LLM call."""
+    if not settings.CHAT_SUMMARY_ENABLED:
+        return
+    try:
+        state = await asyncio.to_thread(_pending_summary, chat_id)
+        if state is None:
+            return
+        summary, summary_until, pending = state
+        with background_priority():
+            text = await acomplete_text(**_summary_request(summary, pending))
+        await asyncio.to_thread(_store_summary, chat_id, summary_until, text, pending[-1].created_at)
+    except Exception:
+        logger.warning("Chat summary update failed for chat_id=%s", chat_id, exc_info=True)
+
+
+def citations_payload(rag: RAGResult) -> list[dict]:
+    return [
+        {
+            "document": c.document,
+            "page": c.page,
+            "section": c.section,
+            "chunk_id": c.chunk_id,
+            "similarity_score": c.similarity_score,
+            "snippet": c.snippet,
+        }
+        for c in rag.citations
+    ]
+
+
+def _save_user_message(db: Session, *, user_id: UUID, chat_id, content: str) -> ChatMessage:
     chat = get_chat(db, user_id=user_id, chat_id=chat_id)
     if not chat:
         raise ValueError("Chat not found")
-
     user_msg = ChatMessage(
         chat_id=chat_id,
         role="user",
         content=content,
-        embedding=get_embedding(content),
         metadata_json={},
     )
     db.add(user_msg)
     db.commit()
     db.refresh(user_msg)
+    return user_msg
 
-    rag = query_rag(db, user_id=user_id, question=content, chat_id=chat_id)
-    citations_payload = [
-        {
-            "document": c.document,
-            "page": c.page,
-            "section": c.section,
-            "chunk_id": c.chunk_id,
-            "similarity_score": c.similarity_score,
-            "snippet": c.snippet,
-        }
-        for c in rag.citations
-    ]
 
+def save_assistant_message(db: Session, *, chat_id, rag: RAGResult) -> ChatMessage:
     assistant_msg = ChatMessage(
         chat_id=chat_id,
         role="assistant",
         content=rag.answer,
         metadata_json={
-            "citations": citations_payload,
+            "citations": citations_payload(rag),
             "confidence_score": rag.confidence_score,
         },
     )
     db.add(assistant_msg)
     db.commit()
     db.refresh(assistant_msg)
+    return assistant_msg
+
+
+def store_streamed_reply(*, chat_id, rag: RAGResult) -> UUID:
+    """Persist a streamed reply with its own session (the request's is closed by then)."""
+    db = SessionLocal()
+    try:
+        return save_assistant_message(db, chat_id=chat_id, rag=rag).id
+    finally:
+        db.close()
+
+
+def process_chat_message(
+    db: Session,
+    *,
+    user_id: UUID,
+    chat_id,
+    content: str,
+    context: PipelineContext | None = None,
+    filters: RetrievalFilters | None = None,
+):
+    """Store the user message, answer it and store the reply.
+
+    The user message is saved without its embedding; callers hand
+    ``context.query_embedding`` (already computed for retrieval) to
+    ``store_message_embedding`` once the response is on its way.
+    """
+    user_msg = _save_user_message(db, user_id=user_id, chat_id=chat_id, content=content)
+    ctx = context or PipelineContext(question=content)
+    rag = query_rag(
+        db,
+        user_id=user_id,
+        question=content,
+        chat_id=chat_id,
+        context=ctx,
+        filters=filters,
+    )
+    assistant_msg = save_assistant_message(db, chat_id=chat_id, rag=rag)
+    return user_msg, assistant_msg
+
+
+def start_chat_message(
+    db: Session,
+    *,
+    user_id: UUID,
+    chat_id,
+    content: str,
+    context: PipelineContext | None = None,
+    filters: RetrievalFilters | None = None,
+) -> tuple[ChatMessage, PreparedQuery]:
+    """Store the user message and run retrieval; generation is left to the caller.
+
+    Used by the streaming endpoint, which stores the reply with
+    ``save_assistant_message`` once the answer has been streamed.
+    """
+    user_msg = _save_user_message(db, user_id=user_id, chat_id=chat_id, content=content)
+    prepared = prepare_query(
+        db,
+        user_id=user_id,
+        question=content,
+        chat_id=chat_id,
+        context=context or PipelineContext(question=content),
+        filters=filters,
+    )
+    return user_msg, prepared
+
+
+async def astart_chat_message(
+    db: Session,
+    *,
+    user_id: UUID,
+    chat_id,
+    content: str,
+    context: PipelineContext | None = None,
+    filters: RetrievalFilters | None = None,
+) -> tuple[ChatMessage, PreparedQuery]:
+    """Async start_chat_message: embeds on the event loop, DB work in a worker thread."""
+    # Check the chat first: an unknown chat is a 404, not a paid embedding call.
+    if not await asyncio.to_thread(get_chat, db, user_id=user_id, chat_id=chat_id):
+        raise ValueError("Chat not found")
+    ctx = context or PipelineContext(question=content)
+    await ctx.aquery_embedding()
+    return await asyncio.to_thread(
+        start_chat_message,
+        db,
+        user_id=user_id,
+        chat_id=chat_id,
+        content=content,
+        context=ctx,
+        filters=filters,
+    )
+
+
+async def aprocess_chat_message(
+    db: Session,
+    *,
+    user_id: UUID,
+    chat_id,
+    content: str,
+    context: PipelineContext | None = None,
+    filters: RetrievalFilters | None = None,
+):
+    """Async process_chat_message; identical concurrent questions share one answer."""
+    user_msg = await asyncio.to_thread(
+        _save_user_message, db, user_id=user_id, chat_id=chat_id, content=content
+    )
+    rag = await aquery_rag(
+        db,
+        user_id=user_id,
+        question=content,
+        chat_id=chat_id,
+        context=context or PipelineContext(question=content),
+        filters=filters,
+    )
+    assistant_msg = await asyncio.to_thread(save_assistant_message, db, chat_id=chat_id, rag=rag)
     return user_msg, assistant_msg
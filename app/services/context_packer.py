@@ -0,0 +1,147 @@
+"""Fit retrieved chunks and chat memory into a per-model prompt token budget."""
+
+from __future__ import annotations
+
+import logging
+import re
+from dataclasses import dataclass, field
+
+from app.core import metrics
+from app.core.config import settings
+from app.services.chunking_service import CHARS_PER_TOKEN_EST, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+# Header and separator added around each chunk by the prompt builders.
+_CHUNK_OVERHEAD_TOKENS = 24
+# Trimming a chunk below this many tokens leaves too little to cite.
+_MIN_TRIMMED_TOKENS = 48
+
+
+@dataclass
+class PackedContext:
+    chunks: list[dict] = field(default_factory=list)
+    memory: list[dict] = field(default_factory=list)
+    packed_tokens: int = 0
+    dropped_tokens: int = 0
+    dropped_chunks: int = 0
+    trimmed_chunks: int = 0
+
+
+def _parse_overrides(raw: str) -> dict[str, int]:
+    overrides = {}
+    for item in raw.split(","):
+        model, sep, budget = item.partition("=")
+        if sep and model.strip() and budget.strip().isdigit():
+            overrides[model.strip()] = int(budget.strip())
+    return overrides
+
+
+def context_budget(provider: str, model: str) -> int:
+    """Prompt token budget for context and memory; per-model overrides win."""
+    overrides = _parse_overrides(settings.CONTEXT_TOKEN_BUDGET_OVERRIDES)
+    if model in overrides:
+        return overrides[model]
+    if provider == "anthropic":
+        return settings.ANTHROPIC_CONTEXT_TOKEN_BUDGET
+    return settings.OPENAI_CONTEXT_TOKEN_BUDGET
+
+
+def trim_to_sentences(text: str, max_tokens: int) -> str:
+    """Longest prefix of whole sentences within max_tokens (word boundary as a fallback)."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    max_chars = max_tokens * CHARS_PER_TOKEN_EST
+    out = ""
+    for sentence in _SENTENCE_END_RE.split(text):
+        candidate = f"{out} {sentence}" if out else sentence
+        if len(candidate) > max_chars:
+            break
+        out = candidate
+    if not out:
+        head = text[:max_chars]
+        out = head.rsplit(None, 1)[0] if " " in head else head
+    return out
+
+
+def _pack_memory(memory_messages: list[dict], budget: int, packed: PackedContext) -> int:
+    """Keep the chat summary, then the newest messages up to the first that does not fit.
+
+    Returns tokens used. The summary stands in for everything older than the
+    kept messages, so it is charged first and never dropped (it is bounded by
+    CHAT_SUMMARY_MAX_TOKENS). Stopping at the first message that does not fit
+    keeps the rest contiguous: no reply loses the question it answered.
+    """
+    pinned = [m for m in memory_messages if m.get("role") == "summary"]
+    used = sum(estimate_tokens(m.get("content", "")) + 4 for m in pinned)
+    others = [m for m in memory_messages if m.get("role") != "summary"]
+    kept: list[dict] = []
+    for message in reversed(others):
+        tokens = estimate_tokens(message.get("content", "")) + 4
+        if used + tokens > budget:
+            break
+        kept.append(message)
+        used += tokens
+    for message in others[: len(others) - len(kept)]:
+        packed.dropped_tokens += estimate_tokens(message.get("content", "")) + 4
+    kept.reverse()
+    packed.memory = pinned + kept
+    return used
+
+
+def pack_context(
+    context_chunks: list[dict],
+    memory_messages: list[dict],
+    *,
+    budget: int,
+) -> PackedContext:
+    """Select chunks (highest similarity first) and memory that fit the budget.
+
+    Memory may use at most MEMORY_TOKEN_SHARE of the budget; whatever it
+    leaves is given to chunks. A chunk that does not fit is trimmed to
+    sentence boundaries if enough room is left, otherwise dropped.
+    """
+    packed = PackedContext()
+    if budget <= 0:
+        packed.chunks = list(context_chunks)
+        packed.memory = list(memory_messages)
+        return packed
+
+    memory_budget = int(budget * settings.MEMORY_TOKEN_SHARE)
+    remaining = budget - _pack_memory(memory_messages, memory_budget, packed)
+
+    ranked = sorted(context_chunks, key=lambda c: c.get("similarity", 0.0), reverse=True)
+    for chunk in ranked:
+        content = chunk.get("content") or ""
+        tokens = estimate_tokens(content)
+        room = remaining - _CHUNK_OVERHEAD_TOKENS
+        if tokens <= room:
+            packed.chunks.append(chunk)
+            remaining -= tokens + _CHUNK_OVERHEAD_TOKENS
+            continue
+        if room >= _MIN_TRIMMED_TOKENS:
+            trimmed = trim_to_sentences(content, room)
+            trimmed_tokens = estimate_tokens(trimmed)
+            packed.chunks.append({**chunk, "content": trimmed})
+            packed.trimmed_chunks += 1
+            packed.dropped_tokens += tokens - trimmed_tokens
+            remaining -= trimmed_tokens + _CHUNK_OVERHEAD_TOKENS
+            continue
+        packed.dropped_chunks += 1
+        packed.dropped_tokens += tokens
+
+    packed.packed_tokens = budget - remaining
+    metrics.incr("context.packed_tokens", packed.packed_tokens)
+    metrics.incr("context.dropped_tokens", packed.dropped_tokens)
+    metrics.incr("context.dropped_chunks", packed.dropped_chunks)
+    metrics.incr("context.trimmed_chunks", packed.trimmed_chunks)
+    if packed.dropped_tokens:
+        logger.debug(
+            "Context packed %s tokens, dropped %s (%s chunks dropped, %s trimmed)",
+            packed.packed_tokens,
+            packed.dropped_tokens,
+            packed.dropped_chunks,
+            packed.trimmed_chunks,
+        )
+    return packed
@@ -0,0 +1,28 @@
+"""Per-user corpus versioning for retrieval and answer caches."""
+
+from __future__ import annotations
+
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from app.models import User
+from app.services import answer_cache, vector_index_cache
+
+
+def get_corpus_version(db: Session, user_id: UUID) -> int:
+    version = db.query(User.corpus_version).filter(User.id == user_id).scalar()
+    return version or 0
+
+
+def mark_corpus_changed(db: Session, user_id: UUID) -> None:
+    """Bump the user's corpus version and drop this process's cached state.
+
+    Other processes notice the new version on their next lookup.
+    """
+    db.query(User).filter(User.id == user_id).update(
+        {User.corpus_version: User.corpus_version + 1}, synchronize_session=False
+    )
+    db.commit()
+    vector_index_cache.invalidate_user(user_id)
+    answer_cache.invalidate_user(user_id)
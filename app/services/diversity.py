@@ -0,0 +1,114 @@
+"""Post-retrieval diversification: MMR re-ranking and near-duplicate removal."""
+
+from __future__ import annotations
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.core.config import settings
+from app.models import DocumentChunk
+from app.services.retrieval_service import RetrievedChunk
+
+DIVERSITY_MODES = ("mmr", "dedup", "off")
+
+
+def _mode() -> str:
+    mode = settings.DIVERSITY_MODE
+    if mode not in DIVERSITY_MODES:
+        raise ValueError(f"Unknown DIVERSITY_MODE: {mode}")
+    return mode
+
+
+def fetch_k(k: int) -> int:
+    """How many candidates to retrieve so that k remain after diversification."""
+    if _mode() == "off":
+        return k
+    return max(k, k * settings.DIVERSITY_FETCH_FACTOR)
+
+
+def load_embeddings(db: Session, ids) -> dict[int, np.ndarray]:
+    """L2-normalised embeddings for the given chunk ids, in one query."""
+    ids = list(set(ids))
+    if not ids:
+        return {}
+    rows = (
+        db.query(DocumentChunk.id, DocumentChunk.embedding)
+        .filter(DocumentChunk.id.in_(ids), DocumentChunk.embedding.isnot(None))
+        .all()
+    )
+    out = {}
+    for chunk_id, embedding in rows:
+        vec = np.asarray(embedding, dtype=np.float32)
+        out[chunk_id] = vec / max(float(np.linalg.norm(vec)), 1e-12)
+    return out
+
+
+def mmr_order(
+    relevance: np.ndarray,
+    matrix: np.ndarray,
+    k: int,
+    *,
+    lambda_: float,
+    dedup_threshold: float,
+) -> list[int]:
+    """Greedy MMR over normalised candidate rows; returns selected row indices.
+
+    Candidates whose similarity to an already selected row reaches
+    ``dedup_threshold`` are never selected. ``lambda_=1`` keeps the input
+    relevance order and only removes near-duplicates.
+    """
+    n = len(relevance)
+    pairwise = matrix @ matrix.T
+    max_sim = np.full(n, -np.inf, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    selected: list[int] = []
+    while len(selected) < k and available.any():
+        redundancy = np.where(np.isfinite(max_sim), max_sim, 0.0)
+        scores = lambda_ * relevance - (1.0 - lambda_) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        max_sim = np.maximum(max_sim, pairwise[best])
+        available &= max_sim < dedup_threshold
+    return selected
+
+
+def select_diverse(
+    rows: list[RetrievedChunk],
+    k: int,
+    embeddings: dict[int, np.ndarray],
+) -> list[RetrievedChunk]:
+    """Pick k of the over-fetched rows according to DIVERSITY_MODE."""
+    mode = _mode()
+    if mode == "off" or len(rows) <= 1:
+        return rows[:k]
+    # Rows without a stored vector cannot be compared; keep them as-is.
+    if any(r.chunk_id not in embeddings for r in rows):
+        return rows[:k]
+
+    matrix = np.stack([embeddings[r.chunk_id] for r in rows])
+    if mode == "mmr" and all(r.fused_score is None for r in rows):
+        relevance = np.asarray([1.0 - r.distance for r in rows], dtype=np.float32)
+    else:
+        # Strictly decreasing scores preserve the retrieval order; for hybrid
+        # results that is the fused order, which cosine similarity would undo
+        # for chunks found mainly by full-text search.
+        relevance = np.linspace(1.0, 0.0, num=len(rows), dtype=np.float32)
+    lambda_ = settings.MMR_LAMBDA if mode == "mmr" else 1.0
+    order = mmr_order(
+        relevance,
+        matrix,
+        k,
+        lambda_=lambda_,
+        dedup_threshold=settings.DEDUP_SIMILARITY_THRESHOLD,
+    )
+    metrics.incr("diversity.dropped", max(0, min(k, len(rows)) - len(order)))
+    return [rows[i] for i in order]
+
+
+def diversify(db: Session, rows: list[RetrievedChunk], k: int) -> list[RetrievedChunk]:
+    if _mode() == "off":
+        return rows[:k]
+    return select_diverse(rows, k, load_embeddings(db, (r.chunk_id for r in rows)))
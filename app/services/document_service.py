@@ -10,6 +10,7 @@ from uuid import UUID
 from sqlalchemy.orm import Session
 
 from app.models import Document
+from app.services.corpus_service import mark_corpus_changed
 from app.services.storage_service import get_storage_service
 
 
@@ -101,6 +102,7 @@ def delete_document(db: Session, user_id: UUID, document_id: int) -> bool:
         # Delete the document record
         db.delete(document)
         db.commit()
+        mark_corpus_changed(db, user_id)
         
         return True
     except Exception as e:
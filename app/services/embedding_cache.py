@@ -0,0 +1,147 @@
+"""Two-tier embedding cache: in-process LRU backed by the embedding_cache table."""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+from array import array
+from collections import OrderedDict
+
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import EmbeddingCacheEntry
+
+logger = logging.getLogger(__name__)
+
+CacheKey = tuple[str, str]
+
+_WRITE_BATCH = 500
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class LRUEmbeddingCache:
+    """Size-bounded LRU holding embeddings as compact float32 arrays."""
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._items: OrderedDict[CacheKey, array] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: CacheKey) -> list[float] | None:
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                return None
+            self._items.move_to_end(key)
+            return value.tolist()
+
+    def put(self, key: CacheKey, embedding) -> None:
+        if self.max_items <= 0:
+            return
+        with self._lock:
+            self._items[key] = array("f", embedding)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+_memory = LRUEmbeddingCache(settings.EMBEDDING_CACHE_MAX_ITEMS)
+
+
+def _load_persisted(model: str, hashes: list[str]) -> dict[str, list[float]]:
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(EmbeddingCacheEntry.content_hash, EmbeddingCacheEntry.embedding)
+            .filter(
+                EmbeddingCacheEntry.model == model,
+                EmbeddingCacheEntry.content_hash.in_(hashes),
+            )
+            .all()
+        )
+        return {h: [float(x) for x in emb] for h, emb in rows}
+    finally:
+        db.close()
+
+
+def _store_persisted(model: str, items: dict[str, list[float]]) -> None:
+    db = SessionLocal()
+    try:
+        rows = [{"model": model, "content_hash": h, "embedding": emb} for h, emb in items.items()]
+        for start in range(0, len(rows), _WRITE_BATCH):
+            stmt = insert(EmbeddingCacheEntry).values(rows[start : start + _WRITE_BATCH])
+            db.execute(stmt.on_conflict_do_nothing(index_elements=["model", "content_hash"]))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def get_many(model: str, texts: list[str]) -> list[list[float] | None]:
+    """Return cached embeddings aligned with ``texts`` (None for misses)."""
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return [None] * len(texts)
+
+    hashes = [content_hash(t) for t in texts]
+    out: list[list[float] | None] = [_memory.get((model, h)) for h in hashes]
+    metrics.incr("embedding_cache.memory_hits", sum(1 for e in out if e is not None))
+
+    pending = sorted({h for h, e in zip(hashes, out) if e is None})
+    if pending and settings.EMBEDDING_CACHE_PERSIST:
+        try:
+            persisted = _load_persisted(model, pending)
+        except Exception:
+            logger.warning("Embedding cache lookup failed; falling back to provider", exc_info=True)
+            persisted = {}
+        for idx, h in enumerate(hashes):
+            if out[idx] is None and h in persisted:
+                out[idx] = persisted[h]
+                _memory.put((model, h), persisted[h])
+                metrics.incr("embedding_cache.db_hits")
+
+    metrics.incr("embedding_cache.misses", sum(1 for e in out if e is None))
+    metrics.incr("embedding_cache.lookups", len(texts))
+    return out
+
+
+def put_many(model: str, texts: list[str], embeddings: list[list[float]]) -> None:
+    """Store freshly computed embeddings in both tiers."""
+    if not settings.EMBEDDING_CACHE_ENABLED or not texts:
+        return
+    items = {content_hash(t): e for t, e in zip(texts, embeddings)}
+    for h, emb in items.items():
+        _memory.put((model, h), emb)
+    if settings.EMBEDDING_CACHE_PERSIST:
+        try:
+            _store_persisted(model, items)
+        except Exception:
+            logger.warning("Embedding cache write failed", exc_info=True)
+
+
+def cache_stats() -> dict:
+    lookups = metrics.get("embedding_cache.lookups")
+    misses = metrics.get("embedding_cache.misses")
+    return {
+        "memory_items": len(_memory),
+        "lookups": lookups,
+        "memory_hits": metrics.get("embedding_cache.memory_hits"),
+        "db_hits": metrics.get("embedding_cache.db_hits"),
+        "misses": misses,
+        "hit_rate": round(1 - misses / lookups, 4) if lookups else 0.0,
+    }
@@ -0,0 +1,125 @@
+"""Embedding provider backends: remote OpenAI or an in-process CPU projection."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+from app.core.config import settings
+from app.services.llm_clients import get_async_openai_embedding_client, get_openai_embedding_client
+
+
+class EmbeddingProvider:
+    #: Namespace for embedding cache keys; must change whenever vectors would change.
+    model_id: str = ""
+    dim: int = 0
+    #: Remote providers are batched, parallelised and retried by embedding_service.
+    remote: bool = False
+    #: Shared outbound rate limiter used for remote calls.
+    rate_limit_key: str = ""
+    retryable_errors: tuple[type[Exception], ...] = ()
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        raise NotImplementedError
+
+    async def aembed(self, texts: list[str]) -> list[list[float]]:
+        return await asyncio.to_thread(self.embed, texts)
+
+
+_NATIVE_DIMS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+}
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    remote = True
+    rate_limit_key = "openai"
+    retryable_errors = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+    def __init__(self, model: str, dim: int):
+        self.model = model
+        self.dim = dim
+        # text-embedding-3 models can return shortened vectors natively.
+        self.reduced = model.startswith("text-embedding-3")
+        # Full-size vectors keep the plain model name as cache key, so entries
+        # written before dimensions were configurable stay valid.
+        shortened = self.reduced and dim != _NATIVE_DIMS.get(model)
+        self.model_id = f"{model}:{dim}" if shortened else model
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        client = get_openai_embedding_client()
+        if not client:
+            raise ValueError("OPENAI_API_KEY not configured")
+        kwargs = {"dimensions": self.dim} if self.reduced else {}
+        response = client.embeddings.create(input=texts, model=self.model, **kwargs)
+        return [d.embedding for d in sorted(response.data, key=lambda x: x.index)]
+
+    async def aembed(self, texts: list[str]) -> list[list[float]]:
+        client = get_async_openai_embedding_client()
+        if not client:
+            raise ValueError("OPENAI_API_KEY not configured")
+        kwargs = {"dimensions": self.dim} if self.reduced else {}
+        response = await client.embeddings.create(input=texts, model=self.model, **kwargs)
+        return [d.embedding for d in sorted(response.data, key=lambda x: x.index)]
+
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+@lru_cache(maxsize=200_000)
+def _bucket(feature: str, dim: int) -> tuple[int, float]:
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+    h = int.from_bytes(digest, "little")
+    return h % dim, (1.0 if h >> 63 else -1.0)
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """Signed feature hashing of word uni/bigrams and character trigrams.
+
+    Deterministic and dependency-free, so ingestion and queries never leave the
+    process. Quality is lexical rather than semantic; use it for offline
+    benchmarking or when latency matters more than paraphrase recall.
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.model_id = f"local-hash-v1:{dim}"
+
+    @staticmethod
+    def _features(text: str) -> Counter[str]:
+        words = _WORD_RE.findall(text.lower())
+        feats: Counter[str] = Counter(words)
+        feats.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+        for word in words:
+            padded = f"#{word}#"
+            feats.update(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+        return feats
+
+    def embed_one(self, text: str) -> list[float]:
+        vec = [0.0] * self.dim
+        for feature, count in self._features(text).items():
+            idx, sign = _bucket(feature, self.dim)
+            vec[idx] += sign * (1.0 + math.log(count))
+        norm = math.sqrt(sum(v * v for v in vec))
+        if norm > 0:
+            vec = [v / norm for v in vec]
+        return vec
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_one(t) for t in texts]
+
+
+@lru_cache
+def get_embedding_provider() -> EmbeddingProvider:
+    if settings.EMBEDDING_PROVIDER == "local":
+        return HashingEmbeddingProvider(settings.EMBEDDING_DIM)
+    if settings.EMBEDDING_PROVIDER != "openai":
+        raise ValueError(f"Unknown EMBEDDING_PROVIDER: {settings.EMBEDDING_PROVIDER}")
+    return OpenAIEmbeddingProvider(settings.EMBEDDING_MODEL, settings.EMBEDDING_DIM)
@@ -1,29 +1,177 @@
-"""Embedding generation via OpenAI."""
+"""Embedding generation through the configured embedding provider."""
 
-from openai import OpenAI
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from app.core.config import settings
+from app.services import embedding_cache
+from app.services.chunking_service import estimate_tokens
+from app.services.embedding_providers import EmbeddingProvider, get_embedding_provider
+from app.services.llm_errors import LLMRateLimitError, to_llm_error
+from app.services.rate_limiter import current_priority, get_limiter
+
+logger = logging.getLogger(__name__)
+
+
+def plan_batches(texts: list[str]) -> list[list[str]]:
+    """Split texts into consecutive batches bounded by item count and estimated tokens."""
+    max_items = max(1, settings.EMBEDDING_BATCH_MAX_ITEMS)
+    max_tokens = max(1, settings.EMBEDDING_BATCH_MAX_TOKENS)
+    batches: list[list[str]] = []
+    current: list[str] = []
+    current_tokens = 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= max_items or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _batch_tokens(batch: list[str]) -> int:
+    return sum(estimate_tokens(text) for text in batch)
 
 
-def _get_client() -> OpenAI | None:
-    if not settings.OPENAI_API_KEY:
-        return None
-    return OpenAI(api_key=settings.OPENAI_API_KEY)
+def _retry_delay(provider: EmbeddingProvider, batch: list[str], attempt: int, exc: Exception) -> float:
+    if attempt >= settings.EMBEDDING_MAX_RETRIES:
+        return -1.0
+    error = to_llm_error(exc)
+    delay = settings.EMBEDDING_RETRY_BASE_DELAY * (2**attempt) * (0.5 + random.random())
+    if isinstance(error, LLMRateLimitError):
+        # Throttle every caller of this provider, not only this batch; the
+        # limiter's acquire before the retry does the waiting.
+        paused = get_limiter(provider.rate_limit_key).penalize(error.retry_after)
+        if paused > 0:
+            logger.warning(
+                "Embedding batch of %s rate limited (attempt %s); provider paused for %.1fs",
+                len(batch),
+                attempt + 1,
+                paused,
+            )
+            return 0.0
+        # RATE_LIMIT_ENABLED=false: nothing else waits, so back off here.
+        delay = max(delay, error.retry_after or 0.0)
+    logger.warning(
+        "Embedding batch of %s failed (attempt %s); retrying in %.1fs",
+        len(batch),
+        attempt + 1,
+        delay,
+    )
+    return delay
+
+
+def _embed_batch(provider: EmbeddingProvider, batch: list[str], priority: str) -> list[list[float]]:
+    """Embed one batch, retrying transient provider errors with jittered backoff."""
+    limiter = get_limiter(provider.rate_limit_key)
+    attempt = 0
+    while True:
+        limiter.acquire(_batch_tokens(batch), priority=priority)
+        try:
+            embeddings = provider.embed(batch)
+            break
+        except provider.retryable_errors as exc:
+            delay = _retry_delay(provider, batch, attempt, exc)
+            if delay < 0:
+                raise
+            time.sleep(delay)
+            attempt += 1
+    limiter.record_success()
+
+    # Cache per batch so a later failure does not throw away finished work.
+    embedding_cache.put_many(provider.model_id, batch, embeddings)
+    return embeddings
+
+
+def _embed_uncached(provider: EmbeddingProvider, texts: list[str]) -> list[list[float]]:
+    batches = plan_batches(texts)
+    # Worker threads do not inherit the caller's context, so pass the priority on.
+    priority = current_priority()
+    if len(batches) == 1:
+        return _embed_batch(provider, batches[0], priority)
+    workers = max(1, min(settings.EMBEDDING_CONCURRENCY, len(batches)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embed") as pool:
+        results = list(pool.map(lambda b: _embed_batch(provider, b, priority), batches))
+    return [embedding for batch in results for embedding in batch]
 
 
 def get_embedding(text: str) -> list[float]:
     """Get embedding for a single text."""
-    client = _get_client()
-    if not client:
-        raise ValueError("OPENAI_API_KEY not configured")
-    response = client.embeddings.create(input=[text], model=settings.EMBEDDING_MODEL)
-    return response.data[0].embedding
+    return get_embeddings([text])[0]
 
 
 def get_embeddings(texts: list[str]) -> list[list[float]]:
-    """Get embeddings for multiple texts (batched)."""
-    client = _get_client()
-    if not client:
-        raise ValueError("OPENAI_API_KEY not configured")
-    response = client.embeddings.create(input=texts, model=settings.EMBEDDING_MODEL)
-    return [d.embedding for d in sorted(response.data, key=lambda x: x.index)]
+    """Get embeddings for multiple texts, serving repeats from the embedding cache."""
+    if not texts:
+        return []
+    provider = get_embedding_provider()
+    if not provider.remote:
+        # In-process providers are cheaper to recompute than to look up.
+        return provider.embed(texts)
+    out = embedding_cache.get_many(provider.model_id, texts)
+
+    missing = list(dict.fromkeys(t for t, e in zip(texts, out) if e is None))
+    if missing:
+        fresh = dict(zip(missing, _embed_uncached(provider, missing)))
+        out = [e if e is not None else fresh[t] for t, e in zip(texts, out)]
+    return out
+
+
+async def _aembed_batch(provider: EmbeddingProvider, batch: list[str]) -> list[list[float]]:
+    limiter = get_limiter(provider.rate_limit_key)
+    attempt = 0
+    while True:
+        await limiter.aacquire(_batch_tokens(batch))
+        try:
+            embeddings = await provider.aembed(batch)
+            break
+        except provider.retryable_errors as exc:
+            delay = _retry_delay(provider, batch, attempt, exc)
+            if delay < 0:
+                raise
+            await asyncio.sleep(delay)
+            attempt += 1
+    limiter.record_success()
+
+    await asyncio.to_thread(embedding_cache.put_many, provider.model_id, batch, embeddings)
+    return embeddings
+
+
+async def _aembed_uncached(provider: EmbeddingProvider, texts: list[str]) -> list[list[float]]:
+    semaphore = asyncio.Semaphore(max(1, settings.EMBEDDING_CONCURRENCY))
+
+    async def run(batch: list[str]) -> list[list[float]]:
+        async with semaphore:
+            return await _aembed_batch(provider, batch)
+
+    results = await asyncio.gather(*(run(b) for b in plan_batches(texts)))
+    return [embedding for batch in results for embedding in batch]
+
+
+async def aget_embedding(text: str) -> list[float]:
+    """Async get_embedding: waits on the provider without holding a thread."""
+    return (await aget_embeddings([text]))[0]
+
+
+async def aget_embeddings(texts: list[str]) -> list[list[float]]:
+    """Async get_embeddings; cache lookups and writes run in worker threads."""
+    if not texts:
+        return []
+    provider = get_embedding_provider()
+    if not provider.remote:
+        return await asyncio.to_thread(provider.embed, texts)
+    out = await asyncio.to_thread(embedding_cache.get_many, provider.model_id, texts)
+
+    missing = list(dict.fromkeys(t for t, e in zip(texts, out) if e is None))
+    if missing:
+        fresh = dict(zip(missing, await _aembed_uncached(provider, missing)))
+        out = [e if e is not None else fresh[t] for t, e in zip(texts, out)]
+    return out
@@ -11,12 +11,15 @@ from sqlalchemy.orm import Session
 from app.core.config import settings
 from app.models import DocumentChunk
 from app.services.chunking_service import semantic_chunk_pages
+from app.services.corpus_service import mark_corpus_changed
 from app.services.document_service import (
     get_document_by_id,
     materialize_document_to_local_temp,
     set_document_status,
 )
 from app.services.embedding_service import get_embeddings
+from app.services.rate_limiter import background_priority
+from app.services.retrieval_service import ensure_tenant_index
 from app.services.text_extraction_service import extract_text
 
 logger = logging.getLogger(__name__)
@@ -45,7 +48,9 @@ def ingest_document(db: Session, document_id: int) -> int:
             set_document_status(db, document, "ready")
             return 0
 
-        embeddings = get_embeddings([c.chunk_text for c in chunks])
+        # Yield provider quota to interactive queries while a large document embeds.
+        with background_priority():
+            embeddings = get_embeddings([c.chunk_text for c in chunks])
         for chunk, embedding in zip(chunks, embeddings):
             row = DocumentChunk(
                 document_id=document.id,
@@ -61,12 +66,22 @@ def ingest_document(db: Session, document_id: int) -> int:
 
         db.commit()
         set_document_status(db, document, "ready")
+        try:
+            ensure_tenant_index(db, document.user_id)
+        except Exception:
+            logger.warning("Tenant index build failed for user_id=%s", document.user_id, exc_info=True)
         return len(chunks)
     except Exception:
         set_document_status(db, document, "failed")
         logger.exception("Ingestion failed for document_id=%s", document_id)
         raise
     finally:
+        # Chunks were replaced (or removed on failure): invalidate cached retrieval state.
+        try:
+            mark_corpus_changed(db, document.user_id)
+        except Exception:
+            db.rollback()
+            logger.warning("Corpus version bump failed for user_id=%s", document.user_id, exc_info=True)
         if str(local_path).startswith(tempfile.gettempdir()):
             try:
                 Path(local_path).unlink(missing_ok=True)
@@ -0,0 +1,189 @@
+"""Postgres-backed ingestion job queue.
+
+Jobs are claimed with ``SELECT ... FOR UPDATE SKIP LOCKED`` so any number of
+worker processes (see ``app/worker.py``) can share the table. A claimed job
+holds a lease (``locked_until``) that the worker extends while it runs; when
+a worker dies the lease expires and another worker picks the job up. Failed
+attempts are retried with jittered exponential backoff up to max_attempts.
+All timestamps come from the database clock, so workers on different
+machines agree on them.
+"""
+
+from __future__ import annotations
+
+import logging
+import random
+from datetime import timedelta
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.core.config import settings
+from app.models import Document, IngestionJob
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def _db_now():
+    return func.timezone("utc", func.now())
+
+
+def _lease():
+    return _db_now() + timedelta(seconds=settings.INGESTION_VISIBILITY_TIMEOUT_SECONDS)
+
+
+def enqueue_ingestion(db: Session, document_id: int) -> IngestionJob:
+    """Queue a document for ingestion; returns the already active job if there is one.
+
+    A partial unique index (one queued/running job per document) settles
+    concurrent enqueues of the same document.
+    """
+    active = db.query(IngestionJob).filter(
+        IngestionJob.document_id == document_id, IngestionJob.status.in_(ACTIVE_STATUSES)
+    )
+    job = active.first()
+    if job is not None:
+        return job
+    job = IngestionJob(
+        document_id=document_id,
+        status="queued",
+        max_attempts=settings.INGESTION_MAX_ATTEMPTS,
+        run_after=_db_now(),
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return active.one()
+    db.refresh(job)
+    metrics.incr("ingestion.enqueued")
+    return job
+
+
+def claim_jobs(db: Session, worker_id: str, limit: int) -> list[IngestionJob]:
+    """Lease up to ``limit`` due jobs (queued, or running with an expired lease)."""
+    if limit <= 0:
+        return []
+    now = _db_now()
+    ids = [
+        row.id
+        for row in db.query(IngestionJob.id)
+        .filter(
+            or_(
+                and_(IngestionJob.status == "queued", IngestionJob.run_after <= now),
+                and_(IngestionJob.status == "running", IngestionJob.locked_until < now),
+            )
+        )
+        .order_by(IngestionJob.run_after)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    ]
+    if not ids:
+        db.rollback()
+        return []
+    db.query(IngestionJob).filter(IngestionJob.id.in_(ids)).update(
+        {
+            IngestionJob.status: "running",
+            IngestionJob.attempts: IngestionJob.attempts + 1,
+            IngestionJob.locked_by: worker_id,
+            IngestionJob.locked_until: _lease(),
+            IngestionJob.updated_at: now,
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+    return db.query(IngestionJob).filter(IngestionJob.id.in_(ids)).all()
+
+
+def extend_leases(db: Session, worker_id: str, job_ids) -> None:
+    """Heartbeat: push back the visibility timeout of jobs this worker still runs."""
+    job_ids = list(job_ids)
+    if not job_ids:
+        return
+    db.query(IngestionJob).filter(
+        IngestionJob.id.in_(job_ids),
+        IngestionJob.locked_by == worker_id,
+        IngestionJob.status == "running",
+    ).update({IngestionJob.locked_until: _lease()}, synchronize_session=False)
+    db.commit()
+
+
+def _release(db: Session, job: IngestionJob, worker_id: str, values: dict) -> bool:
+    """Update a job only while this worker still holds its lease."""
+    values = {
+        **values,
+        IngestionJob.locked_by: None,
+        IngestionJob.locked_until: None,
+        IngestionJob.updated_at: _db_now(),
+    }
+    updated = (
+        db.query(IngestionJob)
+        .filter(
+            IngestionJob.id == job.id,
+            IngestionJob.locked_by == worker_id,
+            IngestionJob.status == "running",
+        )
+        .update(values, synchronize_session=False)
+    )
+    db.commit()
+    if not updated:
+        logger.warning("Lost the lease on ingestion job %s; another worker owns it", job.id)
+    return bool(updated)
+
+
+def complete_job(db: Session, job: IngestionJob, worker_id: str) -> None:
+    if _release(db, job, worker_id, {IngestionJob.status: "succeeded", IngestionJob.last_error: None}):
+        metrics.incr("ingestion.succeeded")
+
+
+def retry_delay(attempts: int) -> float:
+    base = settings.INGESTION_RETRY_BASE_SECONDS * 2 ** max(0, attempts - 1)
+    return min(settings.INGESTION_RETRY_MAX_SECONDS, base) * (0.5 + random.random())
+
+
+def fail_job(db: Session, job: IngestionJob, worker_id: str, error: str, *, retryable: bool = True) -> None:
+    """Schedule a retry with backoff, or mark the job failed once attempts run out."""
+    if retryable and job.attempts < job.max_attempts:
+        delay = retry_delay(job.attempts)
+        values = {
+            IngestionJob.status: "queued",
+            IngestionJob.run_after: _db_now() + timedelta(seconds=delay),
+            IngestionJob.last_error: error,
+        }
+        if _release(db, job, worker_id, values):
+            # The document waits for its retry rather than showing as failed.
+            db.query(Document).filter(Document.id == job.document_id).update(
+                {Document.status: "pending"}, synchronize_session=False
+            )
+            db.commit()
+            metrics.incr("ingestion.retried")
+            logger.warning(
+                "Ingestion job %s (document_id=%s) failed, attempt %s/%s; retrying in %.0fs",
+                job.id,
+                job.document_id,
+                job.attempts,
+                job.max_attempts,
+                delay,
+            )
+        return
+    if _release(db, job, worker_id, {IngestionJob.status: "failed", IngestionJob.last_error: error}):
+        db.query(Document).filter(Document.id == job.document_id).update(
+            {Document.status: "failed"}, synchronize_session=False
+        )
+        db.commit()
+        metrics.incr("ingestion.failed")
+        logger.error(
+            "Ingestion job %s (document_id=%s) failed permanently: %s", job.id, job.document_id, error
+        )
+
+
+def queue_stats(db: Session) -> dict:
+    rows = db.query(IngestionJob.status, func.count()).group_by(IngestionJob.status).all()
+    counts = {status: count for status, count in rows}
+    return {status: counts.get(status, 0) for status in ("queued", "running", "succeeded", "failed")}
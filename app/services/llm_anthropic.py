@@ -1,15 +1,51 @@
 """Anthropic Claude LLM generation for RAG answers."""
 
+from collections.abc import AsyncIterator, Iterator
+
 from anthropic import Anthropic
 
 from app.core.config import settings
-from app.services.llm_prompts import RAG_SYSTEM_PROMPT
+from app.services.llm_clients import get_anthropic_client, get_async_anthropic_client
+from app.services.llm_errors import LLMNotConfiguredError
+from app.services.llm_prompts import RAG_SYSTEM_PROMPT, format_context_block, format_question_block
+from app.services.llm_usage import record_anthropic_usage
 
 
 def _get_client() -> Anthropic | None:
-    if not settings.ANTHROPIC_API_KEY:
-        return None
-    return Anthropic(api_key=settings.ANTHROPIC_API_KEY)
+    return get_anthropic_client()
+
+
+def _cached(block: dict) -> dict:
+    if settings.PROMPT_CACHE_ENABLED:
+        return {**block, "cache_control": {"type": "ephemeral"}}
+    return block
+
+
+def _request(question: str, context_chunks: list[dict], memory_messages: list[dict]) -> dict:
+    # Cache breakpoints after the system prompt and after the retrieved
+    # context: follow-ups that re-send the same chunks reuse both prefixes.
+    return {
+        "model": settings.ANTHROPIC_MODEL,
+        "max_tokens": 2048,
+        "system": [_cached({"type": "text", "text": RAG_SYSTEM_PROMPT})],
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    _cached({"type": "text", "text": format_context_block(context_chunks)}),
+                    {"type": "text", "text": format_question_block(question, memory_messages)},
+                ],
+            }
+        ],
+    }
+
+
+def _text(response) -> str:
+    if response.content and len(response.content) > 0:
+        block = response.content[0]
+        if hasattr(block, "text"):
+            return block.text
+    return ""
 
 
 def generate_answer_anthropic(
@@ -20,32 +56,83 @@ def generate_answer_anthropic(
     """Generate answer from retrieved context using Anthropic Claude."""
     client = _get_client()
     if not client:
-        raise ValueError("ANTHROPIC_API_KEY not configured")
+        raise LLMNotConfiguredError("ANTHROPIC_API_KEY not configured")
 
-    context_text = "\n\n---\n\n".join(
-        f"[doc={c['document']}, page={c['page']}, section={c.get('section')}, chunk_id={c.get('chunk_id')}]\n{c['content']}"
-        for c in context_chunks
-    )
-    memory_text = "\n".join(
-        f"{m.get('role', 'user')}: {m.get('content', '')}" for m in memory_messages
-    )
+    response = client.messages.create(**_request(question, context_chunks, memory_messages))
+    record_anthropic_usage(response.usage)
+    return _text(response)
 
-    user_content = (
-        f"Conversation memory:\n{memory_text}\n\n"
-        f"Retrieved context:\n{context_text}\n\n"
-        f"Question: {question}\n\n"
-        "Answer based ONLY on retrieved context."
-    )
+
+def stream_answer_anthropic(
+    question: str,
+    context_chunks: list[dict],
+    memory_messages: list[dict],
+) -> Iterator[str]:
+    """Yield answer text deltas from a streamed Anthropic message."""
+    client = _get_client()
+    if not client:
+        raise LLMNotConfiguredError("ANTHROPIC_API_KEY not configured")
+
+    with client.messages.stream(**_request(question, context_chunks, memory_messages)) as stream:
+        yield from stream.text_stream
+        record_anthropic_usage(stream.get_final_message().usage)
+
+
+async def agenerate_answer_anthropic(
+    question: str,
+    context_chunks: list[dict],
+    memory_messages: list[dict],
+) -> str:
+    client = get_async_anthropic_client()
+    if not client:
+        raise LLMNotConfiguredError("ANTHROPIC_API_KEY not configured")
+
+    response = await client.messages.create(**_request(question, context_chunks, memory_messages))
+    record_anthropic_usage(response.usage)
+    return _text(response)
+
+
+async def astream_answer_anthropic(
+    question: str,
+    context_chunks: list[dict],
+    memory_messages: list[dict],
+) -> AsyncIterator[str]:
+    client = get_async_anthropic_client()
+    if not client:
+        raise LLMNotConfiguredError("ANTHROPIC_API_KEY not configured")
+
+    async with client.messages.stream(**_request(question, context_chunks, memory_messages)) as stream:
+        async for text in stream.text_stream:
+            yield text
+        record_anthropic_usage((await stream.get_final_message()).usage)
+
+
+def complete_anthropic(system: str, prompt: str, *, max_tokens: int) -> str:
+    """Single-turn completion outside the RAG prompt (e.g. chat summaries)."""
+    client = _get_client()
+    if not client:
+        raise LLMNotConfiguredError("ANTHROPIC_API_KEY not configured")
 
     response = client.messages.create(
         model=settings.ANTHROPIC_MODEL,
-        max_tokens=2048,
-        system=RAG_SYSTEM_PROMPT,
-        messages=[{"role": "user", "content": user_content}],
+        max_tokens=max_tokens,
+        system=system,
+        messages=[{"role": "user", "content": prompt}],
     )
+    record_anthropic_usage(response.usage)
+    return _text(response)
 
-    if response.content and len(response.content) > 0:
-        block = response.content[0]
-        if hasattr(block, "text"):
-            return block.text
-    return ""
+
+async def acomplete_anthropic(system: str, prompt: str, *, max_tokens: int) -> str:
+    client = get_async_anthropic_client()
+    if not client:
+        raise LLMNotConfiguredError("ANTHROPIC_API_KEY not configured")
+
+    response = await client.messages.create(
+        model=settings.ANTHROPIC_MODEL,
+        max_tokens=max_tokens,
+        system=system,
+        messages=[{"role": "user", "content": prompt}],
+    )
+    record_anthropic_usage(response.usage)
+    return _text(response)
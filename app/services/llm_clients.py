@@ -0,0 +1,145 @@
+"""Process-wide OpenAI/Anthropic clients sharing pooled keep-alive HTTP connections."""
+
+from __future__ import annotations
+
+import importlib.util
+import inspect
+import logging
+import threading
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_clients: dict[str, object] = {}
+
+
+def _http2_enabled() -> bool:
+    # HTTP/2 needs the optional ``h2`` package; fall back to HTTP/1.1 keep-alive.
+    return settings.LLM_HTTP2 and importlib.util.find_spec("h2") is not None
+
+
+def _http_options() -> dict:
+    return {
+        "http2": _http2_enabled(),
+        "limits": httpx.Limits(
+            max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(settings.LLM_HTTP_TIMEOUT, connect=settings.LLM_HTTP_CONNECT_TIMEOUT),
+    }
+
+
+def _build_http_client() -> httpx.Client:
+    return httpx.Client(**_http_options())
+
+
+def _build_async_http_client() -> httpx.AsyncClient:
+    # Async clients must only be used from the event loop serving requests.
+    return httpx.AsyncClient(**_http_options())
+
+
+def _get_or_create(name: str, factory):
+    client = _clients.get(name)
+    if client is not None:
+        return client
+    with _lock:
+        client = _clients.get(name)
+        if client is None:
+            client = factory()
+            _clients[name] = client
+        return client
+
+
+def get_openai_client() -> OpenAI | None:
+    """Shared OpenAI client (chat + embeddings), or None when no API key is set."""
+    if not settings.OPENAI_API_KEY:
+        return None
+    return _get_or_create(
+        "openai",
+        lambda: OpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            max_retries=settings.LLM_MAX_RETRIES,
+            http_client=_build_http_client(),
+        ),
+    )
+
+
+def get_openai_embedding_client() -> OpenAI | None:
+    """The shared client without SDK retries: embedding_service retries batches itself."""
+    client = get_openai_client()
+    if client is None:
+        return None
+    return _get_or_create("openai_embeddings", lambda: client.with_options(max_retries=0))
+
+
+def get_anthropic_client():
+    """Shared Anthropic client, or None when no API key is set."""
+    if not settings.ANTHROPIC_API_KEY:
+        return None
+    from anthropic import Anthropic
+
+    return _get_or_create(
+        "anthropic",
+        lambda: Anthropic(
+            api_key=settings.ANTHROPIC_API_KEY,
+            max_retries=settings.LLM_MAX_RETRIES,
+            http_client=_build_http_client(),
+        ),
+    )
+
+
+def get_async_openai_client() -> AsyncOpenAI | None:
+    """Shared AsyncOpenAI client, or None when no API key is set."""
+    if not settings.OPENAI_API_KEY:
+        return None
+    return _get_or_create(
+        "openai_async",
+        lambda: AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            max_retries=settings.LLM_MAX_RETRIES,
+            http_client=_build_async_http_client(),
+        ),
+    )
+
+
+def get_async_anthropic_client():
+    """Shared AsyncAnthropic client, or None when no API key is set."""
+    if not settings.ANTHROPIC_API_KEY:
+        return None
+    from anthropic import AsyncAnthropic
+
+    return _get_or_create(
+        "anthropic_async",
+        lambda: AsyncAnthropic(
+            api_key=settings.ANTHROPIC_API_KEY,
+            max_retries=settings.LLM_MAX_RETRIES,
+            http_client=_build_async_http_client(),
+        ),
+    )
+
+
+def get_async_openai_embedding_client() -> AsyncOpenAI | None:
+    client = get_async_openai_client()
+    if client is None:
+        return None
+    return _get_or_create("openai_embeddings_async", lambda: client.with_options(max_retries=0))
+
+
+async def close_clients() -> None:
+    """Close every pooled client; called from the FastAPI lifespan on shutdown."""
+    with _lock:
+        clients = list(_clients.items())
+        _clients.clear()
+    for name, client in clients:
+        try:
+            result = client.close()
+            if inspect.isawaitable(result):
+                await result
+        except Exception:
+            logger.warning("Failed to close %s client", name, exc_info=True)
@@ -0,0 +1,106 @@
+"""Typed LLM provider failures, so callers never match on exception text."""
+
+from __future__ import annotations
+
+import openai
+
+
+class LLMError(Exception):
+    """Base class; ``failover`` says whether another provider may succeed."""
+
+    failover = True
+
+    def __init__(self, message: str, *, provider: str | None = None, retry_after: float | None = None):
+        super().__init__(message)
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class LLMNotConfiguredError(LLMError):
+    pass
+
+
+class LLMRateLimitError(LLMError):
+    pass
+
+
+class LLMQuotaExceededError(LLMRateLimitError):
+    pass
+
+
+class LLMTimeoutError(LLMError):
+    pass
+
+
+class LLMUnavailableError(LLMError):
+    """Connection failures, 5xx/overloaded responses and open circuits."""
+
+
+class LLMRequestError(LLMError):
+    """The request itself was rejected (4xx); retrying elsewhere will not help."""
+
+    failover = False
+
+
+def _retry_after(exc) -> float | None:
+    response = getattr(exc, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _classify(exc: Exception, rate_limit, timeout, connection, server, status):
+    if isinstance(exc, rate_limit):
+        body = getattr(exc, "body", None)
+        code = body.get("code") if isinstance(body, dict) else None
+        if code is None and isinstance(body, dict) and isinstance(body.get("error"), dict):
+            code = body["error"].get("code")
+        return LLMQuotaExceededError if code == "insufficient_quota" else LLMRateLimitError
+    if isinstance(exc, timeout):
+        return LLMTimeoutError
+    if isinstance(exc, connection):
+        return LLMUnavailableError
+    if isinstance(exc, server):
+        return LLMUnavailableError
+    if isinstance(exc, status):
+        return LLMUnavailableError if getattr(exc, "status_code", 0) >= 500 else LLMRequestError
+    return None
+
+
+def to_llm_error(exc: Exception, provider: str | None = None) -> LLMError | None:
+    """Map an OpenAI/Anthropic SDK exception to an LLMError; None for anything else."""
+    if isinstance(exc, LLMError):
+        return exc
+    error_type = None
+    if isinstance(exc, openai.OpenAIError):
+        provider = provider or "openai"
+        error_type = _classify(
+            exc,
+            openai.RateLimitError,
+            openai.APITimeoutError,
+            openai.APIConnectionError,
+            openai.InternalServerError,
+            openai.APIStatusError,
+        )
+    else:
+        try:
+            import anthropic
+        except ImportError:
+            anthropic = None
+        if anthropic is not None and isinstance(exc, anthropic.AnthropicError):
+            provider = provider or "anthropic"
+            error_type = _classify(
+                exc,
+                anthropic.RateLimitError,
+                anthropic.APITimeoutError,
+                anthropic.APIConnectionError,
+                anthropic.InternalServerError,
+                anthropic.APIStatusError,
+            )
+    if error_type is None:
+        return None
+    error = error_type(str(exc), provider=provider, retry_after=_retry_after(exc))
+    error.__cause__ = exc
+    return error
@@ -1,15 +1,29 @@
 """OpenAI LLM generation for RAG answers."""
 
+from collections.abc import AsyncIterator, Iterator
+
 from openai import OpenAI
 
 from app.core.config import settings
-from app.services.llm_prompts import RAG_SYSTEM_PROMPT
+from app.services.llm_clients import get_async_openai_client, get_openai_client
+from app.services.llm_errors import LLMNotConfiguredError
+from app.services.llm_prompts import RAG_SYSTEM_PROMPT, format_context_block, format_question_block
+from app.services.llm_usage import record_openai_usage
 
 
 def _get_client() -> OpenAI | None:
-    if not settings.OPENAI_API_KEY:
-        return None
-    return OpenAI(api_key=settings.OPENAI_API_KEY)
+    return get_openai_client()
+
+
+def _build_messages(question: str, context_chunks: list[dict], memory_messages: list[dict]) -> list[dict]:
+    # Stable content first: OpenAI caches the longest previously seen prompt
+    # prefix automatically, so the system prompt and the (deterministically
+    # ordered) context come before the per-turn memory and question.
+    return [
+        {"role": "system", "content": RAG_SYSTEM_PROMPT},
+        {"role": "user", "content": format_context_block(context_chunks)},
+        {"role": "user", "content": format_question_block(question, memory_messages)},
+    ]
 
 
 def generate_answer_openai(
@@ -20,32 +34,109 @@ def generate_answer_openai(
     """Generate answer from retrieved context using OpenAI."""
     client = _get_client()
     if not client:
-        raise ValueError("OPENAI_API_KEY not configured")
+        raise LLMNotConfiguredError("OPENAI_API_KEY not configured")
 
-    context_text = "\n\n---\n\n".join(
-        f"[doc={c['document']}, page={c['page']}, section={c.get('section')}, chunk_id={c.get('chunk_id')}]\n{c['content']}"
-        for c in context_chunks
+    response = client.chat.completions.create(
+        model=settings.OPENAI_MODEL,
+        messages=_build_messages(question, context_chunks, memory_messages),
+        temperature=0,
     )
-    memory_text = "\n".join(
-        f"{m.get('role', 'user')}: {m.get('content', '')}" for m in memory_messages
+    record_openai_usage(response.usage)
+    return response.choices[0].message.content
+
+
+def stream_answer_openai(
+    question: str,
+    context_chunks: list[dict],
+    memory_messages: list[dict],
+) -> Iterator[str]:
+    """Yield answer text deltas from a streamed OpenAI completion."""
+    client = _get_client()
+    if not client:
+        raise LLMNotConfiguredError("OPENAI_API_KEY not configured")
+
+    with client.chat.completions.create(
+        model=settings.OPENAI_MODEL,
+        messages=_build_messages(question, context_chunks, memory_messages),
+        temperature=0,
+        stream=True,
+        stream_options={"include_usage": True},
+    ) as stream:
+        for event in stream:
+            if event.usage:
+                record_openai_usage(event.usage)
+            if event.choices and event.choices[0].delta.content:
+                yield event.choices[0].delta.content
+
+
+async def agenerate_answer_openai(
+    question: str,
+    context_chunks: list[dict],
+    memory_messages: list[dict],
+) -> str:
+    client = get_async_openai_client()
+    if not client:
+        raise LLMNotConfiguredError("OPENAI_API_KEY not configured")
+
+    response = await client.chat.completions.create(
+        model=settings.OPENAI_MODEL,
+        messages=_build_messages(question, context_chunks, memory_messages),
+        temperature=0,
     )
+    record_openai_usage(response.usage)
+    return response.choices[0].message.content
+
+
+async def astream_answer_openai(
+    question: str,
+    context_chunks: list[dict],
+    memory_messages: list[dict],
+) -> AsyncIterator[str]:
+    client = get_async_openai_client()
+    if not client:
+        raise LLMNotConfiguredError("OPENAI_API_KEY not configured")
+
+    stream = await client.chat.completions.create(
+        model=settings.OPENAI_MODEL,
+        messages=_build_messages(question, context_chunks, memory_messages),
+        temperature=0,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    async with stream:
+        async for event in stream:
+            if event.usage:
+                record_openai_usage(event.usage)
+            if event.choices and event.choices[0].delta.content:
+                yield event.choices[0].delta.content
 
-    messages = [
-        {"role": "system", "content": RAG_SYSTEM_PROMPT},
-        {
-            "role": "user",
-            "content": (
-                f"Conversation memory:\n{memory_text}\n\n"
-                f"Retrieved context:\n{context_text}\n\n"
-                f"Question: {question}\n\n"
-                "Answer based ONLY on retrieved context."
-            ),
-        },
-    ]
+
+def complete_openai(system: str, prompt: str, *, max_tokens: int) -> str:
+    """Single-turn completion outside the RAG prompt (e.g. chat summaries)."""
+    client = _get_client()
+    if not client:
+        raise LLMNotConfiguredError("OPENAI_API_KEY not configured")
 
     response = client.chat.completions.create(
         model=settings.OPENAI_MODEL,
-        messages=messages,
+        messages=[{"role": "system", "content": system}, {"role": "user", "content": prompt}],
         temperature=0,
+        max_tokens=max_tokens,
     )
-    return response.choices[0].message.content
+    record_openai_usage(response.usage)
+    return response.choices[0].message.content or ""
+
+
+async def acomplete_openai(system: str, prompt: str, *, max_tokens: int) -> str:
+    client = get_async_openai_client()
+    if not client:
+        raise LLMNotConfiguredError("OPENAI_API_KEY not configured")
+
+    response = await client.chat.completions.create(
+        model=settings.OPENAI_MODEL,
+        messages=[{"role": "system", "content": system}, {"role": "user", "content": prompt}],
+        temperature=0,
+        max_tokens=max_tokens,
+    )
+    record_openai_usage(response.usage)
+    return response.choices[0].message.content or ""
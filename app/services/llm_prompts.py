@@ -12,3 +12,44 @@ Rules:
 7) Mention citations inline as [doc: <name>, page: <n>, chunk: <id>] based on provided context.
 8) Focus on the most relevant information that directly answers the question.
 """
+
+
+SUMMARY_SYSTEM_PROMPT = """You maintain a running summary of a conversation between a user and a
+Legal and Compliance Knowledge Assistant.
+
+Rules:
+1) Merge the new messages into the existing summary; return only the updated summary.
+2) Keep the questions asked, the answers given with their document/page citations, and open follow-ups.
+3) Drop greetings, repetition and wording; keep names, dates, figures and defined terms exactly.
+4) Stay under {max_words} words, dropping the oldest, least relevant details first.
+"""
+
+
+def format_context(context_chunks: list[dict]) -> str:
+    """Render chunks in chunk-id order so repeated context yields an identical prompt prefix."""
+    ordered = sorted(context_chunks, key=lambda c: (c.get("chunk_id") is None, c.get("chunk_id") or 0))
+    return "\n\n---\n\n".join(
+        f"[doc={c['document']}, page={c['page']}, section={c.get('section')}, chunk_id={c.get('chunk_id')}]\n{c['content']}"
+        for c in ordered
+    )
+
+
+def format_context_block(context_chunks: list[dict]) -> str:
+    return f"Retrieved context:\n{format_context(context_chunks)}"
+
+
+def format_question_block(question: str, memory_messages: list[dict]) -> str:
+    """The per-turn part of the prompt; it comes after all cacheable content."""
+    memory_text = "\n".join(
+        f"{m.get('role', 'user')}: {m.get('content', '')}" for m in memory_messages
+    )
+    return (
+        f"Conversation memory:\n{memory_text}\n\n"
+        f"Question: {question}\n\n"
+        "Answer based ONLY on retrieved context."
+    )
+
+
+def format_summary_request(summary: str | None, messages: list[dict]) -> str:
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    return f"Existing summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}"
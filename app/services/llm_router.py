@@ -0,0 +1,497 @@
+"""Provider routing for answer generation: failover, hedging and circuit breaking."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Callable, Iterator
+
+from app.core import metrics
+from app.core.config import settings
+from app.services.chunking_service import estimate_tokens
+from app.services.context_packer import PackedContext, context_budget, pack_context
+from app.services.llm_errors import (
+    LLMError,
+    LLMQuotaExceededError,
+    LLMRateLimitError,
+    LLMTimeoutError,
+    LLMUnavailableError,
+    to_llm_error,
+)
+from app.services.rate_limiter import get_limiter
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS = ("openai", "anthropic")
+# Successful call latencies kept per provider for the hedging p95.
+_LATENCY_WINDOW = 200
+_MIN_LATENCY_SAMPLES = 20
+# Completion tokens charged to the token bucket up front.
+_EXPECTED_COMPLETION_TOKENS = 500
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures. After a cool-down (half-open) a single
+    trial call is let through; its success closes the circuit, its failure
+    re-opens it. The trial slot is reclaimed if it stays unresolved for a
+    whole cool-down (e.g. the caller was cancelled)."""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial_started: float | None = None
+        self._lock = threading.Lock()
+
+    def _state(self, now: float) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if now - self._opened_at < self.reset_seconds:
+            return "open"
+        if self._trial_started is not None and now - self._trial_started < self.reset_seconds:
+            return "open"
+        return "half_open"
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def allow(self) -> bool:
+        return self.state != "open"
+
+    def try_acquire(self) -> bool:
+        """Admit one call; in the half-open state this claims the single trial."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._state(now)
+            if state == "half_open":
+                self._trial_started = now
+            return state != "open"
+
+    def release(self) -> None:
+        """Give back a trial that ended without saying anything about provider health."""
+        with self._lock:
+            self._trial_started = None
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_started = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_started = None
+
+
+class LatencyTracker:
+    def __init__(self, window: int = _LATENCY_WINDOW):
+        self._samples: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def p95(self) -> float | None:
+        with self._lock:
+            if len(self._samples) < _MIN_LATENCY_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+_breakers = {
+    name: CircuitBreaker(settings.LLM_CIRCUIT_FAILURE_THRESHOLD, settings.LLM_CIRCUIT_RESET_SECONDS)
+    for name in PROVIDERS
+}
+_latencies = {name: LatencyTracker() for name in PROVIDERS}
+
+
+def _provider_order() -> list[str]:
+    primary = (settings.LLM_PROVIDER or "openai").lower()
+    fallbacks = [p.strip().lower() for p in settings.LLM_FALLBACK_PROVIDERS.split(",") if p.strip()]
+    order = []
+    for name in [primary, *fallbacks]:
+        if name not in PROVIDERS:
+            raise ValueError(f"Unknown LLM provider: {name}")
+        if name not in order:
+            order.append(name)
+    return order
+
+
+def _candidates() -> list[str]:
+    order = _provider_order()
+    allowed = [name for name in order if _breakers[name].allow()]
+    if not allowed:
+        metrics.incr("llm.circuit_rejections")
+        raise LLMUnavailableError(f"All LLM providers unavailable (circuits open: {', '.join(order)})")
+    return allowed
+
+
+def _latency_budget(provider: str) -> float:
+    if provider == "anthropic":
+        return settings.ANTHROPIC_LATENCY_BUDGET_SECONDS
+    return settings.OPENAI_LATENCY_BUDGET_SECONDS
+
+
+def _hedge_delay(provider: str) -> float:
+    p95 = _latencies[provider].p95()
+    return max(settings.LLM_HEDGE_MIN_DELAY_SECONDS, p95 or 0.0)
+
+
+def _budget(provider: str) -> int:
+    model = settings.ANTHROPIC_MODEL if provider == "anthropic" else settings.OPENAI_MODEL
+    return context_budget(provider, model)
+
+
+def pack(context_chunks: list[dict], memory_messages: list[dict] | None) -> PackedContext:
+    """Pack for the tightest budget among the configured providers.
+
+    Packing happens once, before routing, so whichever provider answers sees
+    exactly the chunks that are cited.
+    """
+    budgets = [budget for budget in map(_budget, _provider_order()) if budget > 0]
+    return pack_context(context_chunks, memory_messages or [], budget=min(budgets, default=0))
+
+
+def _request_tokens(question: str, context_chunks: list[dict], memory_messages: list[dict] | None) -> int:
+    prompt = sum(estimate_tokens(c.get("content") or "") for c in context_chunks)
+    prompt += sum(estimate_tokens(m.get("content", "")) for m in memory_messages or [])
+    return estimate_tokens(question) + prompt + _EXPECTED_COMPLETION_TOKENS
+
+
+def _throttled(provider: str) -> LLMRateLimitError:
+    """Local limiter would hold the call past its latency budget: try the next provider."""
+    return LLMRateLimitError(f"{provider} is rate limited locally", provider=provider)
+
+
+def _circuit_open(provider: str) -> LLMUnavailableError:
+    """Another call holds the half-open trial (or the circuit opened since _candidates)."""
+    metrics.incr("llm.circuit_rejections")
+    return LLMUnavailableError(f"{provider} circuit is open", provider=provider)
+
+
+def _functions(provider: str) -> dict[str, Callable]:
+    if provider == "anthropic":
+        from app.services import llm_anthropic as module
+
+        return {
+            "generate": module.generate_answer_anthropic,
+            "stream": module.stream_answer_anthropic,
+            "agenerate": module.agenerate_answer_anthropic,
+            "astream": module.astream_answer_anthropic,
+            "complete": module.complete_anthropic,
+            "acomplete": module.acomplete_anthropic,
+        }
+    from app.services import llm_openai as module
+
+    return {
+        "generate": module.generate_answer_openai,
+        "stream": module.stream_answer_openai,
+        "agenerate": module.agenerate_answer_openai,
+        "astream": module.astream_answer_openai,
+        "complete": module.complete_openai,
+        "acomplete": module.acomplete_openai,
+    }
+
+
+def _succeeded(provider: str, started: float) -> None:
+    _breakers[provider].record_success()
+    get_limiter(provider).record_success()
+    _latencies[provider].record(time.monotonic() - started)
+    metrics.incr(f"llm.{provider}.calls")
+
+
+def _failed(provider: str, exc: Exception) -> LLMError:
+    error = to_llm_error(exc, provider)
+    if error is None:
+        raise exc
+    # Only outages and timeouts count against the circuit; rate limits, missing
+    # configuration and rejected (4xx) requests say nothing about provider health.
+    if isinstance(error, (LLMUnavailableError, LLMTimeoutError)):
+        _breakers[provider].record_failure()
+    else:
+        _breakers[provider].release()
+    if isinstance(error, LLMRateLimitError) and not isinstance(error, LLMQuotaExceededError):
+        get_limiter(provider).penalize(error.retry_after)
+    metrics.incr(f"llm.{provider}.failures")
+    logger.warning("LLM provider %s failed: %s: %s", provider, type(error).__name__, error)
+    return error
+
+
+def _raise_last(errors: list[LLMError]) -> None:
+    if len(errors) > 1:
+        metrics.incr("llm.all_failed")
+    raise errors[-1]
+
+
+# Synchronous path: failover and circuit breaking. Hedging needs concurrent
+# calls, so it is only done on the async path used by the API.
+
+
+def generate(question: str, context_chunks: list[dict], memory_messages: list[dict] | None) -> str:
+    errors: list[LLMError] = []
+    for provider in _candidates():
+        if not _breakers[provider].try_acquire():
+            errors.append(_circuit_open(provider))
+            continue
+        if not get_limiter(provider).acquire(
+            _request_tokens(question, context_chunks, memory_messages), max_wait=_latency_budget(provider)
+        ):
+            _breakers[provider].release()
+            errors.append(_throttled(provider))
+            continue
+        started = time.monotonic()
+        try:
+            answer = _functions(provider)["generate"](question, context_chunks, memory_messages or [])
+        except Exception as exc:
+            error = _failed(provider, exc)
+            errors.append(error)
+            if not error.failover:
+                raise error from exc
+            continue
+        _succeeded(provider, started)
+        return answer
+    _raise_last(errors)
+
+
+def stream(question: str, context_chunks: list[dict], memory_messages: list[dict] | None) -> Iterator[str]:
+    """Fail over to the next provider only until the first delta has been yielded."""
+    errors: list[LLMError] = []
+    for provider in _candidates():
+        if not _breakers[provider].try_acquire():
+            errors.append(_circuit_open(provider))
+            continue
+        if not get_limiter(provider).acquire(
+            _request_tokens(question, context_chunks, memory_messages), max_wait=_latency_budget(provider)
+        ):
+            _breakers[provider].release()
+            errors.append(_throttled(provider))
+            continue
+        started = time.monotonic()
+        emitted = False
+        try:
+            for delta in _functions(provider)["stream"](question, context_chunks, memory_messages or []):
+                emitted = True
+                yield delta
+        except Exception as exc:
+            error = _failed(provider, exc)
+            if emitted or not error.failover:
+                raise error from exc
+            errors.append(error)
+            continue
+        _succeeded(provider, started)
+        return
+    _raise_last(errors)
+
+
+def complete(system: str, prompt: str, *, max_tokens: int) -> str:
+    """Failover for housekeeping completions that are not RAG answers."""
+    errors: list[LLMError] = []
+    for provider in _candidates():
+        if not _breakers[provider].try_acquire():
+            errors.append(_circuit_open(provider))
+            continue
+        if not get_limiter(provider).acquire(
+            estimate_tokens(system + prompt) + max_tokens, max_wait=_latency_budget(provider)
+        ):
+            _breakers[provider].release()
+            errors.append(_throttled(provider))
+            continue
+        started = time.monotonic()
+        try:
+            text = _functions(provider)["complete"](system, prompt, max_tokens=max_tokens)
+        except Exception as exc:
+            error = _failed(provider, exc)
+            errors.append(error)
+            if not error.failover:
+                raise error from exc
+            continue
+        _succeeded(provider, started)
+        return text
+    _raise_last(errors)
+
+
+# Async path: per-provider latency budgets, failover and optional hedging.
+
+
+async def _attempt(provider: str, question: str, context_chunks: list[dict], memory_messages) -> str:
+    if not _breakers[provider].try_acquire():
+        raise _circuit_open(provider)
+    try:
+        admitted = await get_limiter(provider).aacquire(
+            _request_tokens(question, context_chunks, memory_messages), max_wait=_latency_budget(provider)
+        )
+    except asyncio.CancelledError:
+        _breakers[provider].release()
+        raise
+    if not admitted:
+        _breakers[provider].release()
+        raise _throttled(provider)
+    started = time.monotonic()
+    call = _functions(provider)["agenerate"](question, context_chunks, memory_messages or [])
+    try:
+        answer = await asyncio.wait_for(call, timeout=_latency_budget(provider))
+    except asyncio.CancelledError:
+        # A hedge loser (or a caller that went away) says nothing about the provider.
+        _breakers[provider].release()
+        raise
+    except asyncio.TimeoutError as exc:
+        raise _failed(
+            provider,
+            LLMTimeoutError(f"{provider} exceeded its latency budget", provider=provider),
+        ) from exc
+    except Exception as exc:
+        raise _failed(provider, exc) from exc
+    _succeeded(provider, started)
+    return answer
+
+
+async def _hedged(primary: str, backup: str, question: str, context_chunks, memory_messages) -> str:
+    """Run the primary; start the backup if it is slower than its p95, first success wins."""
+    tasks = {asyncio.create_task(_attempt(primary, question, context_chunks, memory_messages)): primary}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=_hedge_delay(primary))
+        if not done:
+            metrics.incr("llm.hedges")
+            tasks[asyncio.create_task(_attempt(backup, question, context_chunks, memory_messages))] = backup
+        pending = set(tasks)
+        errors: list[LLMError] = []
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if tasks[task] == backup:
+                        metrics.incr("llm.hedge_wins")
+                    return task.result()
+                error = task.exception()
+                if not isinstance(error, LLMError) or not error.failover:
+                    raise error
+                errors.append(error)
+            if len(tasks) == 1 and not pending:
+                # The primary failed before the hedge delay: fail over normally.
+                return await _attempt(backup, question, context_chunks, memory_messages)
+        _raise_last(errors)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def acomplete(system: str, prompt: str, *, max_tokens: int) -> str:
+    """Async complete: housekeeping completions on the async clients, off the threadpool."""
+    errors: list[LLMError] = []
+    for provider in _candidates():
+        if not _breakers[provider].try_acquire():
+            errors.append(_circuit_open(provider))
+            continue
+        if not await get_limiter(provider).aacquire(
+            estimate_tokens(system + prompt) + max_tokens, max_wait=_latency_budget(provider)
+        ):
+            _breakers[provider].release()
+            errors.append(_throttled(provider))
+            continue
+        started = time.monotonic()
+        try:
+            text = await _functions(provider)["acomplete"](system, prompt, max_tokens=max_tokens)
+        except Exception as exc:
+            error = _failed(provider, exc)
+            errors.append(error)
+            if not error.failover:
+                raise error from exc
+            continue
+        _succeeded(provider, started)
+        return text
+    _raise_last(errors)
+
+
+async def agenerate(question: str, context_chunks: list[dict], memory_messages: list[dict] | None) -> str:
+    candidates = _candidates()
+    errors: list[LLMError] = []
+    if settings.LLM_HEDGE_ENABLED and len(candidates) > 1:
+        try:
+            return await _hedged(candidates[0], candidates[1], question, context_chunks, memory_messages)
+        except LLMError as error:
+            if not error.failover:
+                raise
+            errors.append(error)
+        candidates = candidates[2:]
+    for provider in candidates:
+        try:
+            return await _attempt(provider, question, context_chunks, memory_messages)
+        except LLMError as error:
+            if not error.failover:
+                raise
+            errors.append(error)
+    _raise_last(errors)
+
+
+async def astream(
+    question: str,
+    context_chunks: list[dict],
+    memory_messages: list[dict] | None,
+) -> AsyncIterator[str]:
+    """Fail over until the first delta; the latency budget bounds time to that first delta."""
+    errors: list[LLMError] = []
+    for provider in _candidates():
+        if not _breakers[provider].try_acquire():
+            errors.append(_circuit_open(provider))
+            continue
+        if not await get_limiter(provider).aacquire(
+            _request_tokens(question, context_chunks, memory_messages), max_wait=_latency_budget(provider)
+        ):
+            _breakers[provider].release()
+            errors.append(_throttled(provider))
+            continue
+        started = time.monotonic()
+        deltas = _functions(provider)["astream"](question, context_chunks, memory_messages or [])
+        try:
+            try:
+                first = await asyncio.wait_for(deltas.__anext__(), timeout=_latency_budget(provider))
+            except StopAsyncIteration:
+                _succeeded(provider, started)
+                return
+            except Exception as exc:
+                if isinstance(exc, asyncio.TimeoutError):
+                    exc = LLMTimeoutError(f"{provider} exceeded its latency budget", provider=provider)
+                error = _failed(provider, exc)
+                if not error.failover:
+                    raise error from exc
+                errors.append(error)
+                continue
+
+            yield first
+            try:
+                async for delta in deltas:
+                    yield delta
+            except Exception as exc:
+                raise _failed(provider, exc) from exc
+            _succeeded(provider, started)
+            return
+        except (asyncio.CancelledError, GeneratorExit):
+            # The client went away mid-stream: free a half-open trial.
+            _breakers[provider].release()
+            raise
+        finally:
+            await deltas.aclose()
+    _raise_last(errors)
+
+
+def router_stats() -> dict:
+    return {
+        name: {
+            "circuit": _breakers[name].state,
+            "p95_seconds": _latencies[name].p95(),
+            "calls": metrics.get(f"llm.{name}.calls"),
+            "failures": metrics.get(f"llm.{name}.failures"),
+        }
+        for name in PROVIDERS
+    }
@@ -1,7 +1,18 @@
 """LLM answer generation with provider routing."""
 
-from app.core.config import settings
-from app.services.llm_openai import generate_answer_openai
+from collections.abc import AsyncIterator, Iterator
+
+from app.services import llm_router
+from app.services.context_packer import PackedContext
+
+
+def pack_answer_context(context_chunks: list[dict], memory_messages: list[dict] | None = None) -> PackedContext:
+    """Fit chunks and memory into the prompt budget every routed provider can take.
+
+    The generate/stream functions below send their context as given, so the
+    chunks kept here are exactly the ones the answer can cite.
+    """
+    return llm_router.pack(context_chunks, memory_messages)
 
 
 def generate_answer(
@@ -10,10 +21,49 @@ def generate_answer(
     context_chunks: list[dict],
     memory_messages: list[dict] | None = None,
 ) -> str:
-    """Generate an answer from retrieved context with optional memory snippets."""
-    provider = (settings.LLM_PROVIDER or "openai").lower()
+    """Generate an answer from retrieved context with optional memory snippets.
+
+    Providers are tried in LLM_PROVIDER, LLM_FALLBACK_PROVIDERS order, skipping
+    open circuits; failures surface as ``llm_errors.LLMError`` subclasses.
+    """
+    return llm_router.generate(question, context_chunks, memory_messages)
+
+
+def stream_answer(
+    *,
+    question: str,
+    context_chunks: list[dict],
+    memory_messages: list[dict] | None = None,
+) -> Iterator[str]:
+    """Like generate_answer, but yields the answer as text deltas."""
+    return llm_router.stream(question, context_chunks, memory_messages)
+
+
+async def agenerate_answer(
+    *,
+    question: str,
+    context_chunks: list[dict],
+    memory_messages: list[dict] | None = None,
+) -> str:
+    """Async generate_answer, with per-provider latency budgets and optional hedging."""
+    return await llm_router.agenerate(question, context_chunks, memory_messages)
+
+
+def astream_answer(
+    *,
+    question: str,
+    context_chunks: list[dict],
+    memory_messages: list[dict] | None = None,
+) -> AsyncIterator[str]:
+    """Async stream_answer: an async iterator of text deltas."""
+    return llm_router.astream(question, context_chunks, memory_messages)
+
+
+def complete_text(*, system: str, prompt: str, max_tokens: int) -> str:
+    """Plain completion routed like answers (used for chat summaries)."""
+    return llm_router.complete(system, prompt, max_tokens=max_tokens)
+
 
-    if provider == "anthropic":
-        from app.services.llm_anthropic import generate_answer_anthropic
-        return generate_answer_anthropic(question, context_chunks, memory_messages or [])
-    return generate_answer_openai(question, context_chunks, memory_messages or [])
+async def acomplete_text(*, system: str, prompt: str, max_tokens: int) -> str:
+    """Async complete_text on the providers' async clients."""
+    return await llm_router.acomplete(system, prompt, max_tokens=max_tokens)
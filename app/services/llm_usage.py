@@ -0,0 +1,37 @@
+"""Token usage accounting, including provider prompt-cache hits."""
+
+from __future__ import annotations
+
+from app.core import metrics
+
+
+def record_openai_usage(usage) -> None:
+    """Count prompt and automatically cached prefix tokens from an OpenAI usage object."""
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    metrics.incr("llm.openai.prompt_tokens", usage.prompt_tokens or 0)
+    metrics.incr("llm.openai.cached_tokens", getattr(details, "cached_tokens", None) or 0)
+
+
+def record_anthropic_usage(usage) -> None:
+    """Count input tokens plus cache reads/writes from an Anthropic usage object."""
+    if usage is None:
+        return
+    read = getattr(usage, "cache_read_input_tokens", None) or 0
+    written = getattr(usage, "cache_creation_input_tokens", None) or 0
+    # input_tokens excludes cached tokens; the prompt size is the sum.
+    metrics.incr("llm.anthropic.prompt_tokens", (usage.input_tokens or 0) + read + written)
+    metrics.incr("llm.anthropic.cached_tokens", read)
+    metrics.incr("llm.anthropic.cache_write_tokens", written)
+
+
+def prompt_cache_stats() -> dict:
+    return {
+        provider: {
+            "prompt_tokens": metrics.get(f"llm.{provider}.prompt_tokens"),
+            "cached_tokens": metrics.get(f"llm.{provider}.cached_tokens"),
+            "cached_ratio": metrics.ratio(f"llm.{provider}.cached_tokens", f"llm.{provider}.prompt_tokens"),
+        }
+        for provider in ("openai", "anthropic")
+    }
@@ -0,0 +1,32 @@
+"""Request-scoped state shared between the stages of one RAG request."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+from app.services.embedding_service import aget_embedding, get_embedding
+
+
+@dataclass
+class PipelineContext:
+    """Carries values computed once per request (e.g. the query embedding)."""
+
+    question: str
+    _query_embedding: list[float] | None = field(default=None, repr=False)
+
+    @property
+    def query_embedding(self) -> list[float]:
+        if self._query_embedding is None:
+            self._query_embedding = get_embedding(self.question)
+        return self._query_embedding
+
+    async def aquery_embedding(self) -> list[float]:
+        """Compute the embedding without blocking the event loop."""
+        if self._query_embedding is None:
+            self._query_embedding = await aget_embedding(self.question)
+        return self._query_embedding
+
+    def share_embedding(self, embedding: list[float]) -> None:
+        """Adopt the embedding of a coalesced request for the same question."""
+        if self._query_embedding is None:
+            self._query_embedding = embedding
@@ -2,15 +2,39 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+import asyncio
+from collections.abc import AsyncIterator, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from uuid import UUID
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select, true
+from sqlalchemy.orm import Session, aliased
 
+from app.core import metrics
 from app.core.config import settings
-from app.models import ChatMessage, Document, DocumentChunk
-from app.services.embedding_service import get_embedding
-from app.services.llm_service import generate_answer
+from app.core.database import SessionLocal
+from app.models import Chat, ChatMessage
+from app.services import answer_cache
+from app.services.chunking_service import estimate_tokens
+from app.services.corpus_service import get_corpus_version
+from app.services.diversity import diversify, fetch_k, load_embeddings, select_diverse
+from app.services.embedding_service import aget_embeddings, get_embeddings
+from app.services.llm_service import (
+    agenerate_answer,
+    astream_answer,
+    generate_answer,
+    pack_answer_context,
+    stream_answer,
+)
+from app.services.pipeline_context import PipelineContext
+from app.services.retrieval_service import (
+    RetrievalFilters,
+    RetrievedChunk,
+    search_chunks,
+    search_chunks_batch,
+)
+from app.services.singleflight import SingleFlight
 
 
 @dataclass
@@ -34,16 +58,350 @@ def _distance_to_similarity(distance: float) -> float:
     return max(0.0, min(1.0, 1.0 - float(distance)))
 
 
-def get_chat_memory(db: Session, chat_id, max_messages: int) -> list[dict]:
-    rows = (
-        db.query(ChatMessage)
-        .filter(ChatMessage.chat_id == chat_id)
-        .order_by(ChatMessage.created_at.desc())
-        .limit(max_messages)
-        .all()
+def _recent_messages(db: Session, chat_id, limit: int, after=None) -> list:
+    query = db.query(ChatMessage.role, ChatMessage.content, ChatMessage.created_at).filter(
+        ChatMessage.chat_id == chat_id
     )
+    if after is not None:
+        query = query.filter(ChatMessage.created_at > after)
+    rows = query.order_by(ChatMessage.created_at.desc()).limit(limit).all()
     rows.reverse()
-    return [{"role": r.role, "content": r.content} for r in rows]
+    return rows
+
+
+def _similar_turns(db: Session, chat_id, query_embedding: list[float], before, limit: int) -> list:
+    """Earlier user messages nearest to the query, each with the assistant reply that followed.
+
+    One chat holds few messages, so they are ranked exactly: "+ 0" keeps the
+    planner on the chat_id index instead of an ANN scan over every chat's
+    messages that would be post-filtered down to this chat.
+    """
+    distance = ChatMessage.embedding.cosine_distance(query_embedding)
+    asked = (
+        select(ChatMessage.content, ChatMessage.created_at, distance.label("distance"))
+        .where(
+            ChatMessage.chat_id == chat_id,
+            ChatMessage.role == "user",
+            ChatMessage.embedding.isnot(None),
+            ChatMessage.created_at < before,
+        )
+        .order_by(distance + 0)
+        .limit(limit)
+        .subquery("asked")
+    )
+    answer = aliased(ChatMessage)
+    reply = (
+        select(answer.content)
+        .where(
+            answer.chat_id == chat_id,
+            answer.role == "assistant",
+            answer.created_at > asked.c.created_at,
+        )
+        .order_by(answer.created_at)
+        .limit(1)
+        .lateral("reply")
+    )
+    return db.execute(
+        select(asked.c.content, asked.c.created_at, asked.c.distance, reply.c.content.label("reply"))
+        .select_from(asked)
+        .outerjoin(reply, true())
+    ).all()
+
+
+def get_chat_memory(
+    db: Session,
+    chat_id,
+    max_messages: int,
+    query_embedding: list[float] | None = None,
+) -> list[dict]:
+    """The chat summary, the latest turns and, given a query embedding, the most similar earlier turns.
+
+    Once the chat has a rolling summary, only messages newer than it are
+    read as recent turns. Recent messages are kept newest first and similar
+    turns by similarity until CHAT_MEMORY_TOKEN_BUDGET is used up; the
+    result is chronological.
+    """
+    budget = settings.CHAT_MEMORY_TOKEN_BUDGET
+    summary, summary_until = None, None
+    if settings.CHAT_SUMMARY_ENABLED:
+        row = db.query(Chat.summary, Chat.summary_until).filter(Chat.id == chat_id).first()
+        if row is not None and row.summary:
+            summary, summary_until = row.summary, row.summary_until
+    recent_limit = max_messages
+    if query_embedding is not None or summary:
+        recent_limit = min(max_messages, settings.CHAT_MEMORY_RECENT_MESSAGES)
+    recent = _recent_messages(db, chat_id, recent_limit, after=summary_until)
+
+    used = estimate_tokens(summary) if summary else 0
+    kept = []
+    for row in reversed(recent):
+        tokens = estimate_tokens(row.content)
+        if budget > 0 and kept and used + tokens > budget:
+            break
+        kept.append(row)
+        used += tokens
+    kept.reverse()
+    memory = [{"role": r.role, "content": r.content} for r in kept]
+    if summary:
+        memory.insert(0, {"role": "summary", "content": summary})
+
+    slots = max_messages - len(kept)
+    limit = settings.CHAT_MEMORY_SIMILAR_TURNS
+    if query_embedding is None or not recent or slots <= 0 or limit <= 0:
+        return memory
+    turns = []
+    for turn in _similar_turns(db, chat_id, query_embedding, recent[0].created_at, limit):
+        messages = [{"role": "user", "content": turn.content}]
+        if turn.reply:
+            messages.append({"role": "assistant", "content": turn.reply})
+        tokens = sum(estimate_tokens(m["content"]) for m in messages)
+        if len(messages) > slots or (budget > 0 and used + tokens > budget):
+            continue
+        turns.append((turn.created_at, messages))
+        slots -= len(messages)
+        used += tokens
+    turns.sort(key=lambda t: t[0])
+    earlier = [m for _, messages in turns for m in messages]
+    if summary:
+        return memory[:1] + earlier + memory[1:]
+    return earlier + memory
+
+
+NOT_FOUND_ANSWER = "Not found in uploaded documents"
+
+
+@dataclass
+class PreparedQuery:
+    """Everything needed to generate an answer; built with the DB session, used without it."""
+
+    user_id: UUID
+    question: str
+    query_embedding: list[float]
+    corpus_version: int
+    cache_scope: str
+    context_chunks: list[dict] = field(default_factory=list)
+    citations: list[Citation] = field(default_factory=list)
+    memory_messages: list[dict] = field(default_factory=list)
+    # Set when the query is answered without the LLM (cache hit, nothing retrieved).
+    result: RAGResult | None = None
+
+
+def _rank_scores(rows: list[RetrievedChunk]) -> list[float]:
+    """Scores behind the rows' ranking: cosine similarity, or the RRF score
+    relative to the best one for hybrid results."""
+    if all(r.fused_score is not None for r in rows):
+        top = max(r.fused_score for r in rows) or 1.0
+        return [r.fused_score / top for r in rows]
+    return [_distance_to_similarity(r.distance) for r in rows]
+
+
+def confident_rows(rows: list[RetrievedChunk]) -> list[RetrievedChunk]:
+    """Apply the similarity gate and adaptive k to diversified rows, in their given order.
+
+    Returns [] when even the best chunk is below RETRIEVAL_MIN_SIMILARITY,
+    unless full-text search matched one of them (an exact term match can
+    have low vector similarity). Otherwise, with ADAPTIVE_TOP_K_ENABLED, the
+    rows are cut at the largest drop between consecutive ranks (after
+    ADAPTIVE_TOP_K_MIN), provided that drop is at least ADAPTIVE_TOP_K_MIN_GAP.
+    """
+    if not rows:
+        return rows
+    best = max(_distance_to_similarity(r.distance) for r in rows)
+    if best < settings.RETRIEVAL_MIN_SIMILARITY and not any(r.lexical for r in rows):
+        metrics.incr("rag.below_threshold")
+        return []
+    start = max(1, settings.ADAPTIVE_TOP_K_MIN)
+    if not settings.ADAPTIVE_TOP_K_ENABLED or len(rows) <= start:
+        return rows
+    scores = _rank_scores(rows)
+    gaps = [scores[i - 1] - scores[i] for i in range(start, len(rows))]
+    largest = max(gaps)
+    if largest < settings.ADAPTIVE_TOP_K_MIN_GAP:
+        return rows
+    kept = rows[: start + gaps.index(largest)]
+    metrics.incr("rag.adaptive_trimmed", len(rows) - len(kept))
+    return kept
+
+
+def _fill_from_rows(prepared: PreparedQuery, rows: list[RetrievedChunk]) -> None:
+    metrics.incr("rag.retrievals")
+    rows = confident_rows(rows)
+    if not rows:
+        metrics.incr("rag.llm_skipped")
+        prepared.result = RAGResult(answer=NOT_FOUND_ANSWER, citations=[], confidence_score=0.0)
+        return
+    chunks = [
+        {
+            "document": chunk.document,
+            "page": chunk.page,
+            "section": chunk.section,
+            "chunk_id": chunk.chunk_id,
+            "content": chunk.text,
+            "similarity": _distance_to_similarity(chunk.distance),
+        }
+        for chunk in rows
+    ]
+    # Cite (and score confidence on) only what survives packing, with the
+    # trimmed text the model actually sees.
+    packed = pack_answer_context(chunks, prepared.memory_messages)
+    prepared.context_chunks = packed.chunks
+    prepared.memory_messages = packed.memory
+    for chunk in packed.chunks:
+        prepared.citations.append(
+            Citation(
+                document=chunk["document"],
+                page=chunk["page"],
+                section=chunk["section"],
+                chunk_id=chunk["chunk_id"],
+                similarity_score=round(chunk["similarity"], 4),
+                snippet=(chunk["content"] or "")[:500],
+            )
+        )
+
+
+def prepare_query(
+    db: Session,
+    *,
+    user_id: UUID,
+    question: str,
+    chat_id=None,
+    top_k: int | None = None,
+    context: PipelineContext | None = None,
+    filters: RetrievalFilters | None = None,
+    ef_search: int | None = None,
+    iterative_scan: str | None = None,
+) -> PreparedQuery:
+    """Embed, check the answer cache and retrieve context for one question."""
+    k = top_k or settings.TOP_K
+    ctx = context or PipelineContext(question=question)
+    memory_messages = []
+    if chat_id:
+        memory_messages = get_chat_memory(
+            db,
+            chat_id,
+            settings.MAX_CHAT_MEMORY_MESSAGES,
+            query_embedding=ctx.query_embedding,
+        )
+    prepared = PreparedQuery(
+        user_id=user_id,
+        question=question,
+        query_embedding=ctx.query_embedding,
+        corpus_version=get_corpus_version(db, user_id),
+        cache_scope=answer_cache.scope_key(
+            memory=memory_messages,
+            k=k,
+            filters=filters.cache_key() if filters else None,
+            scan=(ef_search, iterative_scan),
+        ),
+        memory_messages=memory_messages,
+    )
+    prepared.result = answer_cache.lookup(
+        user_id, prepared.query_embedding, prepared.corpus_version, prepared.cache_scope
+    )
+    if prepared.result is not None:
+        return prepared
+
+    rows = search_chunks(
+        db,
+        user_id=user_id,
+        query_embedding=prepared.query_embedding,
+        query_text=question,
+        k=fetch_k(k),
+        ef_search=ef_search,
+        iterative_scan=iterative_scan,
+        corpus_version=prepared.corpus_version,
+        filters=filters,
+    )
+    _fill_from_rows(prepared, diversify(db, rows, k))
+    return prepared
+
+
+_flights = SingleFlight("rag")
+
+
+def _memory_fingerprint(db: Session, chat_id) -> str | None:
+    """The chat's memory as of its last answered turn: newest reply and summary position.
+
+    The caller's own question is saved just before the query runs, so user
+    messages after the last reply are left out; otherwise two identical
+    questions in one chat would never share a key.
+    """
+    if not chat_id:
+        return None
+    latest_reply = (
+        db.query(ChatMessage.id)
+        .filter(ChatMessage.chat_id == chat_id, ChatMessage.role == "assistant")
+        .order_by(ChatMessage.created_at.desc())
+        .limit(1)
+        .scalar()
+    )
+    summary_until = db.query(Chat.summary_until).filter(Chat.id == chat_id).scalar()
+    return f"{chat_id}:{latest_reply}:{summary_until}"
+
+
+def coalesce_key(
+    db: Session,
+    *,
+    user_id: UUID,
+    question: str,
+    chat_id=None,
+    top_k: int | None = None,
+    filters: RetrievalFilters | None = None,
+    ef_search: int | None = None,
+    iterative_scan: str | None = None,
+) -> tuple:
+    """(user, normalised question, hash of chat memory, k, filters and scan overrides)."""
+    return (
+        user_id,
+        " ".join(question.split()).casefold(),
+        answer_cache.scope_key(
+            memory=_memory_fingerprint(db, chat_id),
+            k=top_k or settings.TOP_K,
+            filters=filters.cache_key() if filters else None,
+            scan=(ef_search, iterative_scan),
+        ),
+    )
+
+
+def answer_prepared(prepared: PreparedQuery) -> RAGResult:
+    """Generate (or return the short-circuited) answer; does not touch the DB."""
+    if prepared.result is not None:
+        return prepared.result
+    answer = generate_answer(
+        question=prepared.question,
+        context_chunks=prepared.context_chunks,
+        memory_messages=prepared.memory_messages,
+    )
+    return finish_prepared(prepared, answer)
+
+
+def stream_prepared(prepared: PreparedQuery) -> Iterator[str]:
+    """Yield the answer as text deltas; pass their concatenation to finish_prepared."""
+    if prepared.result is not None:
+        yield prepared.result.answer
+        return
+    yield from stream_answer(
+        question=prepared.question,
+        context_chunks=prepared.context_chunks,
+        memory_messages=prepared.memory_messages,
+    )
+
+
+def finish_prepared(prepared: PreparedQuery, answer: str) -> RAGResult:
+    """Build the RAGResult for a generated answer and store it in the answer cache."""
+    if prepared.result is not None:
+        return prepared.result
+    citations = prepared.citations
+    confidence = sum(c.similarity_score for c in citations) / len(citations) if citations else 0.0
+    result = RAGResult(answer=answer, citations=citations, confidence_score=round(confidence, 4))
+    answer_cache.store(
+        prepared.user_id,
+        prepared.query_embedding,
+        prepared.corpus_version,
+        prepared.cache_scope,
+        result,
+    )
+    return result
 
 
 def query_rag(
@@ -53,55 +411,267 @@ def query_rag(
     question: str,
     chat_id=None,
     top_k: int | None = None,
+    context: PipelineContext | None = None,
+    filters: RetrievalFilters | None = None,
+    ef_search: int | None = None,
+    iterative_scan: str | None = None,
 ) -> RAGResult:
-    k = top_k or settings.TOP_K
-    query_embedding = get_embedding(question)
+    """Answer one question; identical concurrent calls share a single computation."""
+    ctx = context or PipelineContext(question=question)
 
-    rows = (
-        db.query(
-            DocumentChunk,
-            Document.filename,
-            DocumentChunk.embedding.cosine_distance(query_embedding).label("distance"),
+    def run() -> tuple[RAGResult, list[float]]:
+        prepared = prepare_query(
+            db,
+            user_id=user_id,
+            question=question,
+            chat_id=chat_id,
+            top_k=top_k,
+            context=ctx,
+            filters=filters,
+            ef_search=ef_search,
+            iterative_scan=iterative_scan,
         )
-        .join(Document, Document.id == DocumentChunk.document_id)
-        .filter(DocumentChunk.user_id == user_id)
-        .order_by(DocumentChunk.embedding.cosine_distance(query_embedding))
-        .limit(k)
-        .all()
+        return answer_prepared(prepared), prepared.query_embedding
+
+    if not settings.SINGLE_FLIGHT_ENABLED:
+        return run()[0]
+    key = coalesce_key(
+        db,
+        user_id=user_id,
+        question=question,
+        chat_id=chat_id,
+        top_k=top_k,
+        filters=filters,
+        ef_search=ef_search,
+        iterative_scan=iterative_scan,
     )
+    result, embedding = _flights.do(key, run)
+    ctx.share_embedding(embedding)
+    return result
 
-    if not rows:
-        return RAGResult(
-            answer="Not found in uploaded documents",
-            citations=[],
-            confidence_score=0.0,
-        )
 
-    context_chunks = []
-    citations: list[Citation] = []
-    for chunk, filename, distance in rows:
-        similarity = _distance_to_similarity(distance)
-        context_chunks.append(
-            {
-                "document": filename,
-                "page": chunk.page_number,
-                "section": chunk.section,
-                "chunk_id": chunk.id,
-                "content": chunk.chunk_text,
-            }
-        )
-        citations.append(
-            Citation(
-                document=filename,
-                page=chunk.page_number,
-                section=chunk.section,
-                chunk_id=chunk.id,
-                similarity_score=round(similarity, 4),
-                snippet=(chunk.chunk_text or "")[:500],
-            )
+def prepare_batch(
+    db: Session,
+    *,
+    user_id: UUID,
+    questions: list[str],
+    top_k: int | None = None,
+    embeddings: list[list[float]] | None = None,
+) -> list[PreparedQuery]:
+    """Prepare many questions with one embedding call and one retrieval round trip."""
+    k = top_k or settings.TOP_K
+    if embeddings is None:
+        embeddings = get_embeddings(questions)
+    corpus_version = get_corpus_version(db, user_id)
+    cache_scope = answer_cache.scope_key(memory=[], k=k)
+    prepared = [
+        PreparedQuery(
+            user_id=user_id,
+            question=question,
+            query_embedding=embedding,
+            corpus_version=corpus_version,
+            cache_scope=cache_scope,
         )
+        for question, embedding in zip(questions, embeddings)
+    ]
+    for item in prepared:
+        item.result = answer_cache.lookup(user_id, item.query_embedding, corpus_version, cache_scope)
+
+    pending = [item for item in prepared if item.result is None]
+    results = search_chunks_batch(
+        db,
+        user_id=user_id,
+        query_embeddings=[item.query_embedding for item in pending],
+        query_texts=[item.question for item in pending],
+        k=fetch_k(k),
+    )
+    embeddings = load_embeddings(db, (r.chunk_id for rows in results for r in rows))
+    for item, rows in zip(pending, results):
+        _fill_from_rows(item, select_diverse(rows, k, embeddings))
+    return prepared
+
+
+def rag_stats() -> dict:
+    """How often the LLM call was skipped (nothing relevant) or shared (coalesced requests)."""
+    return {
+        "retrievals": metrics.get("rag.retrievals"),
+        "llm_skipped": metrics.get("rag.llm_skipped"),
+        "llm_skip_rate": metrics.ratio("rag.llm_skipped", "rag.retrievals"),
+        "below_threshold": metrics.get("rag.below_threshold"),
+        "adaptive_trimmed_chunks": metrics.get("rag.adaptive_trimmed"),
+        "single_flight": _flights.stats(),
+    }
+
+
+def answer_batch(
+    prepared: list[PreparedQuery],
+    *,
+    concurrency: int | None = None,
+) -> Iterator[tuple[int, RAGResult | Exception]]:
+    """Generate answers with bounded concurrency, yielding them in input order."""
+    workers = max(1, concurrency or settings.RAG_BATCH_CONCURRENCY)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rag-batch") as pool:
+        futures = [pool.submit(answer_prepared, item) for item in prepared]
+        for idx, future in enumerate(futures):
+            try:
+                yield idx, future.result()
+            except Exception as exc:
+                yield idx, exc
+
+
+# Async variants: embedding and LLM calls await the providers' async clients;
+# the synchronous SQLAlchemy work runs in a worker thread via asyncio.to_thread.
+
+
+async def aprepare_query(
+    db: Session,
+    *,
+    user_id: UUID,
+    question: str,
+    chat_id=None,
+    top_k: int | None = None,
+    context: PipelineContext | None = None,
+    filters: RetrievalFilters | None = None,
+    ef_search: int | None = None,
+    iterative_scan: str | None = None,
+) -> PreparedQuery:
+    ctx = context or PipelineContext(question=question)
+    await ctx.aquery_embedding()
+    return await asyncio.to_thread(
+        prepare_query,
+        db,
+        user_id=user_id,
+        question=question,
+        chat_id=chat_id,
+        top_k=top_k,
+        context=ctx,
+        filters=filters,
+        ef_search=ef_search,
+        iterative_scan=iterative_scan,
+    )
+
+
+def _prepare_with_own_session(**kwargs) -> PreparedQuery:
+    db = SessionLocal()
+    try:
+        return prepare_query(db, **kwargs)
+    finally:
+        db.close()
+
+
+async def aanswer_prepared(prepared: PreparedQuery) -> RAGResult:
+    if prepared.result is not None:
+        return prepared.result
+    answer = await agenerate_answer(
+        question=prepared.question,
+        context_chunks=prepared.context_chunks,
+        memory_messages=prepared.memory_messages,
+    )
+    return finish_prepared(prepared, answer)
+
+
+async def astream_prepared(prepared: PreparedQuery) -> AsyncIterator[str]:
+    if prepared.result is not None:
+        yield prepared.result.answer
+        return
+    async for delta in astream_answer(
+        question=prepared.question,
+        context_chunks=prepared.context_chunks,
+        memory_messages=prepared.memory_messages,
+    ):
+        yield delta
+
+
+async def aquery_rag(
+    db: Session,
+    *,
+    user_id: UUID,
+    question: str,
+    chat_id=None,
+    top_k: int | None = None,
+    context: PipelineContext | None = None,
+    filters: RetrievalFilters | None = None,
+    ef_search: int | None = None,
+    iterative_scan: str | None = None,
+) -> RAGResult:
+    ctx = context or PipelineContext(question=question)
+    prepare_args = dict(
+        user_id=user_id,
+        question=question,
+        chat_id=chat_id,
+        top_k=top_k,
+        context=ctx,
+        filters=filters,
+        ef_search=ef_search,
+        iterative_scan=iterative_scan,
+    )
+    if not settings.SINGLE_FLIGHT_ENABLED:
+        return await aanswer_prepared(await aprepare_query(db, **prepare_args))
+
+    async def run() -> tuple[RAGResult, list[float]]:
+        # The shared task outlives a cancelled leader, whose request session
+        # get_db closes; it retrieves on a session of its own.
+        await ctx.aquery_embedding()
+        prepared = await asyncio.to_thread(_prepare_with_own_session, **prepare_args)
+        return await aanswer_prepared(prepared), prepared.query_embedding
+
+    key_args = dict(
+        user_id=user_id,
+        question=question,
+        chat_id=chat_id,
+        top_k=top_k,
+        filters=filters,
+        ef_search=ef_search,
+        iterative_scan=iterative_scan,
+    )
+    # Only the chat memory fingerprint needs the database.
+    if chat_id:
+        key = await asyncio.to_thread(coalesce_key, db, **key_args)
+    else:
+        key = coalesce_key(db, **key_args)
+    result, embedding = await _flights.ado(key, run)
+    ctx.share_embedding(embedding)
+    return result
+
+
+async def aprepare_batch(
+    db: Session,
+    *,
+    user_id: UUID,
+    questions: list[str],
+    top_k: int | None = None,
+) -> list[PreparedQuery]:
+    embeddings = await aget_embeddings(questions)
+    return await asyncio.to_thread(
+        prepare_batch,
+        db,
+        user_id=user_id,
+        questions=questions,
+        top_k=top_k,
+        embeddings=embeddings,
+    )
+
+
+async def aanswer_batch(
+    prepared: list[PreparedQuery],
+    *,
+    concurrency: int | None = None,
+) -> AsyncIterator[tuple[int, RAGResult | Exception]]:
+    """Async answer_batch: bounded concurrent generations, yielded in input order."""
+    semaphore = asyncio.Semaphore(max(1, concurrency or settings.RAG_BATCH_CONCURRENCY))
+
+    async def run(item: PreparedQuery) -> RAGResult:
+        async with semaphore:
+            return await aanswer_prepared(item)
 
-    memory_messages = get_chat_memory(db, chat_id, settings.MAX_CHAT_MEMORY_MESSAGES) if chat_id else []
-    answer = generate_answer(question=question, context_chunks=context_chunks, memory_messages=memory_messages)
-    confidence = sum(c.similarity_score for c in citations) / len(citations)
-    return RAGResult(answer=answer, citations=citations, confidence_score=round(confidence, 4))
+    tasks = [asyncio.create_task(run(item)) for item in prepared]
+    try:
+        for idx, task in enumerate(tasks):
+            try:
+                yield idx, await task
+            except Exception as exc:
+                yield idx, exc
+    finally:
+        # The client went away: stop generations nobody will read.
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,237 @@
+"""Process-wide token buckets for outbound provider calls.
+
+Every provider has a request bucket and a token bucket shared by embedding
+and generation calls. Interactive work (queries, chat) may drain them;
+background work (chat summaries) must leave RATE_LIMIT_INTERACTIVE_RESERVE of
+each bucket untouched. After a 429 all callers hold off until Retry-After (or a
+jittered exponential backoff) has passed, and background callers twice as long.
+
+Buckets are per process. Ingestion worker processes call
+``use_ingestion_limits`` and get their own share of the INGESTION_* limits
+instead of the API's; with no interactive callers they keep no reserve.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from app.core import metrics
+from app.core.config import settings
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+# Buckets hold this many seconds' worth of their per-minute rate.
+_BURST_SECONDS = 10.0
+# Waiters re-check at least this often, so interactive calls can overtake them.
+_POLL_SECONDS = 0.25
+_MAX_BACKOFF_SECONDS = 60.0
+
+_priority: ContextVar[str] = ContextVar("rate_limit_priority", default=INTERACTIVE)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+@contextmanager
+def background_priority() -> Iterator[None]:
+    """Mark provider calls made inside the block as background work."""
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * _BURST_SECONDS)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_for(self, amount: float, floor: float) -> float:
+        """Seconds until ``amount`` can be taken while leaving ``floor`` behind.
+
+        Amounts above the capacity are admitted once the bucket is full and
+        leave it in debt, which later callers wait out.
+        """
+        needed = min(amount, self.capacity - floor) + floor - self.level
+        return max(0.0, needed / self.rate)
+
+
+class ProviderLimiter:
+    def __init__(self, name: str, requests_per_minute: int, tokens_per_minute: int, reserve: float = 0.0):
+        self.name = name
+        self.reserve = reserve
+        self._buckets = (
+            TokenBucket(requests_per_minute) if requests_per_minute > 0 else None,
+            TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None,
+        )
+        self._lock = threading.Lock()
+        self._blocked_until = {INTERACTIVE: 0.0, BACKGROUND: 0.0}
+        self._strikes = 0
+
+    def _try(self, tokens: int, priority: str) -> float:
+        """Take one request and ``tokens`` tokens; 0 on success, else seconds to wait."""
+        now = time.monotonic()
+        with self._lock:
+            blocked = self._blocked_until[priority] - now
+            if blocked > 0:
+                return blocked
+            reserve = self.reserve if priority == BACKGROUND else 0.0
+            wait = 0.0
+            for bucket, amount in zip(self._buckets, (1, tokens)):
+                if bucket is not None:
+                    bucket.refill(now)
+                    wait = max(wait, bucket.wait_for(amount, reserve * bucket.capacity))
+            if wait > 0:
+                return wait
+            for bucket, amount in zip(self._buckets, (1, tokens)):
+                if bucket is not None:
+                    bucket.level -= amount
+            return 0.0
+
+    def _admit(self, tokens: int, priority: str | None, deadline: float | None) -> tuple[str, float]:
+        priority = priority or current_priority()
+        wait = self._try(tokens, priority)
+        if wait > 0 and deadline is not None and time.monotonic() + wait > deadline:
+            metrics.incr(f"ratelimit.{self.name}.rejected")
+            return priority, -1.0
+        return priority, wait
+
+    def acquire(self, tokens: int = 0, *, priority: str | None = None, max_wait: float | None = None) -> bool:
+        """Block until the call may go out; False if that would take longer than max_wait."""
+        if not settings.RATE_LIMIT_ENABLED:
+            return True
+        started = time.monotonic()
+        deadline = None if max_wait is None else started + max_wait
+        while True:
+            priority, wait = self._admit(tokens, priority, deadline)
+            if wait < 0:
+                return False
+            if wait == 0:
+                self._record_wait(priority, started)
+                return True
+            time.sleep(min(wait, _POLL_SECONDS))
+
+    async def aacquire(
+        self,
+        tokens: int = 0,
+        *,
+        priority: str | None = None,
+        max_wait: float | None = None,
+    ) -> bool:
+        if not settings.RATE_LIMIT_ENABLED:
+            return True
+        started = time.monotonic()
+        deadline = None if max_wait is None else started + max_wait
+        while True:
+            priority, wait = self._admit(tokens, priority, deadline)
+            if wait < 0:
+                return False
+            if wait == 0:
+                self._record_wait(priority, started)
+                return True
+            await asyncio.sleep(min(wait, _POLL_SECONDS))
+
+    def _record_wait(self, priority: str, started: float) -> None:
+        waited_ms = int((time.monotonic() - started) * 1000)
+        if waited_ms:
+            metrics.incr(f"ratelimit.{self.name}.{priority}.waits")
+            metrics.incr(f"ratelimit.{self.name}.{priority}.wait_ms", waited_ms)
+
+    def penalize(self, retry_after: float | None = None) -> float:
+        """Record a 429 from the provider and hold callers back; returns the delay."""
+        if not settings.RATE_LIMIT_ENABLED:
+            return 0.0
+        with self._lock:
+            self._strikes += 1
+            if retry_after is None:
+                retry_after = min(
+                    _MAX_BACKOFF_SECONDS,
+                    settings.RATE_LIMIT_BACKOFF_SECONDS * 2 ** (self._strikes - 1),
+                )
+            delay = retry_after * (1.0 + 0.2 * random.random())
+            now = time.monotonic()
+            self._blocked_until[INTERACTIVE] = max(self._blocked_until[INTERACTIVE], now + delay)
+            self._blocked_until[BACKGROUND] = max(self._blocked_until[BACKGROUND], now + 2 * delay)
+        metrics.incr(f"ratelimit.{self.name}.throttled")
+        return delay
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._strikes = 0
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            blocked = max(0.0, self._blocked_until[INTERACTIVE] - now)
+        out = {
+            "blocked_seconds": round(blocked, 2),
+            "throttled": metrics.get(f"ratelimit.{self.name}.throttled"),
+            "rejected": metrics.get(f"ratelimit.{self.name}.rejected"),
+        }
+        for priority in (INTERACTIVE, BACKGROUND):
+            out[f"{priority}_waits"] = metrics.get(f"ratelimit.{self.name}.{priority}.waits")
+            out[f"{priority}_wait_ms"] = metrics.get(f"ratelimit.{self.name}.{priority}.wait_ms")
+        return out
+
+
+_limiters: dict[str, ProviderLimiter] = {}
+_limiters_lock = threading.Lock()
+_ingestion_process = False
+
+
+def use_ingestion_limits() -> None:
+    """Size this process's buckets as one of INGESTION_WORKER_PROCESSES workers."""
+    global _ingestion_process
+    with _limiters_lock:
+        _ingestion_process = True
+        _limiters.clear()
+
+
+def _share(per_minute: int) -> int:
+    # Never round a configured limit down to 0, which would mean unlimited.
+    return max(1, per_minute // max(1, settings.INGESTION_WORKER_PROCESSES)) if per_minute > 0 else 0
+
+
+def _limits(name: str) -> tuple[int, int]:
+    if _ingestion_process:
+        if name == "anthropic":
+            return (
+                _share(settings.INGESTION_ANTHROPIC_REQUESTS_PER_MINUTE),
+                _share(settings.INGESTION_ANTHROPIC_TOKENS_PER_MINUTE),
+            )
+        return (
+            _share(settings.INGESTION_OPENAI_REQUESTS_PER_MINUTE),
+            _share(settings.INGESTION_OPENAI_TOKENS_PER_MINUTE),
+        )
+    if name == "anthropic":
+        return settings.ANTHROPIC_REQUESTS_PER_MINUTE, settings.ANTHROPIC_TOKENS_PER_MINUTE
+    return settings.OPENAI_REQUESTS_PER_MINUTE, settings.OPENAI_TOKENS_PER_MINUTE
+
+
+def get_limiter(name: str) -> ProviderLimiter:
+    with _limiters_lock:
+        if name not in _limiters:
+            reserve = 0.0 if _ingestion_process else settings.RATE_LIMIT_INTERACTIVE_RESERVE
+            _limiters[name] = ProviderLimiter(name, *_limits(name), reserve=reserve)
+        return _limiters[name]
+
+
+def rate_limit_stats() -> dict:
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
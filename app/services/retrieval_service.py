@@ -0,0 +1,631 @@
+"""Chunk retrieval: vector (optionally quantized) and hybrid full-text search."""
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime
+from uuid import UUID
+
+from pgvector.sqlalchemy import BIT, HALFVEC, Vector
+from sqlalchemy import (
+    Float,
+    Integer,
+    Text,
+    cast,
+    column,
+    func,
+    literal,
+    literal_column,
+    select,
+    text,
+    true,
+    union_all,
+    values,
+)
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import engine
+from app.models import Document, DocumentChunk
+from app.models.document_chunk import TSVECTOR_CONFIG
+from app.services.corpus_service import get_corpus_version
+from app.services.vector_index_cache import UserVectorIndex, get_user_index
+
+VECTOR_INDEX_MODES = ("full", "halfvec", "binary")
+ANN_INDEX_NAMES = {
+    "full": "ix_document_chunks_embedding_hnsw",
+    "halfvec": "ix_document_chunks_embedding_halfvec_hnsw",
+    "binary": "ix_document_chunks_embedding_bit_hnsw",
+}
+HNSW_ITERATIVE_SCAN_MODES = ("off", "strict_order", "relaxed_order")
+_HNSW_DEFAULT_EF_SEARCH = 40
+_HNSW_MAX_EF_SEARCH = 1000
+
+
+def _mode(mode: str | None) -> str:
+    mode = (mode or settings.VECTOR_INDEX_MODE).lower()
+    if mode not in VECTOR_INDEX_MODES:
+        raise ValueError(f"Unknown VECTOR_INDEX_MODE: {mode}")
+    return mode
+
+
+def _ann_index_target(mode: str) -> str:
+    dim = settings.EMBEDDING_DIM
+    if mode == "halfvec":
+        return f"(embedding::halfvec({dim})) halfvec_cosine_ops"
+    if mode == "binary":
+        return f"(binary_quantize(embedding)::bit({dim})) bit_hamming_ops"
+    return "embedding vector_cosine_ops"
+
+
+def ann_index_statement(mode: str | None = None) -> str:
+    """DDL for the HNSW index serving the given mode's coarse search."""
+    mode = _mode(mode)
+    return (
+        f"CREATE INDEX IF NOT EXISTS {ANN_INDEX_NAMES[mode]} "
+        f"ON document_chunks USING hnsw ({_ann_index_target(mode)})"
+    )
+
+
+def tenant_index_name(user_id: UUID, mode: str | None = None) -> str:
+    return f"ix_dc_{_mode(mode)}_{UUID(str(user_id)).hex}"
+
+
+def tenant_index_statement(user_id: UUID, mode: str | None = None) -> str:
+    """DDL for a per-tenant partial HNSW index (same expression as the global one)."""
+    mode = _mode(mode)
+    user_id = UUID(str(user_id))
+    return (
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {tenant_index_name(user_id, mode)} "
+        f"ON document_chunks USING hnsw ({_ann_index_target(mode)}) "
+        f"WHERE user_id = '{user_id}'"
+    )
+
+
+def ensure_tenant_index(db: Session, user_id: UUID) -> bool:
+    """Build a partial HNSW index for tenants above TENANT_INDEX_MIN_CHUNKS.
+
+    A partial index only holds the tenant's own rows, so its ANN search never
+    wastes candidates on other users' chunks. The tenant's indexes for other
+    VECTOR_INDEX_MODEs, and an invalid index left behind by a failed
+    concurrent build (which IF NOT EXISTS would otherwise keep), are dropped.
+    A per-tenant advisory lock keeps concurrent ingestions from treating each
+    other's in-progress (and therefore still invalid) build as failed; the
+    one that does not get the lock leaves the index to the other.
+    """
+    if settings.TENANT_INDEX_MIN_CHUNKS <= 0:
+        return False
+    count = db.query(func.count(DocumentChunk.id)).filter(DocumentChunk.user_id == user_id).scalar()
+    if count < settings.TENANT_INDEX_MIN_CHUNKS:
+        return False
+    wanted = tenant_index_name(user_id)
+    tenant_names = [tenant_index_name(user_id, mode) for mode in VECTOR_INDEX_MODES]
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction block.
+    lock_key = f"tenant_index:{UUID(str(user_id)).hex}"
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if not conn.execute(text("SELECT pg_try_advisory_lock(hashtext(:key))"), {"key": lock_key}).scalar():
+            return False
+        try:
+            existing = conn.execute(
+                text(
+                    "SELECT c.relname, i.indisvalid FROM pg_class c "
+                    "JOIN pg_index i ON i.indexrelid = c.oid "
+                    "WHERE c.relname = ANY(:names)"
+                ),
+                {"names": tenant_names},
+            ).all()
+            for name, valid in existing:
+                if name != wanted or not valid:
+                    conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+            conn.execute(text(tenant_index_statement(user_id)))
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(hashtext(:key))"), {"key": lock_key})
+    return True
+
+
+def configure_ann_scan(
+    db: Session,
+    *,
+    limit: int,
+    ef_search: int | None = None,
+    iterative_scan: str | None = None,
+) -> None:
+    """Apply per-query HNSW settings for the current transaction (SET LOCAL)."""
+    ef = settings.HNSW_EF_SEARCH if ef_search is None else ef_search
+    if ef > 0 or limit > _HNSW_DEFAULT_EF_SEARCH:
+        # ef_search bounds how many rows one index scan can return.
+        ef = min(_HNSW_MAX_EF_SEARCH, max(ef, limit))
+        db.execute(text(f"SET LOCAL hnsw.ef_search = {int(ef)}"))
+
+    scan = (iterative_scan or settings.HNSW_ITERATIVE_SCAN).lower()
+    if scan not in HNSW_ITERATIVE_SCAN_MODES:
+        raise ValueError(f"Unknown HNSW_ITERATIVE_SCAN: {scan}")
+    if scan != "off":
+        db.execute(text(f"SET LOCAL hnsw.iterative_scan = {scan}"))
+        if settings.HNSW_MAX_SCAN_TUPLES > 0:
+            db.execute(text(f"SET LOCAL hnsw.max_scan_tuples = {int(settings.HNSW_MAX_SCAN_TUPLES)}"))
+
+
+def coarse_distance(query_embedding, mode: str | None = None):
+    """Distance expression matching the mode's index expression exactly.
+
+    ``query_embedding`` is a list of floats or a vector SQL expression.
+    """
+    mode = _mode(mode)
+    dim = settings.EMBEDDING_DIM
+    if mode == "halfvec":
+        return cast(DocumentChunk.embedding, HALFVEC(dim)).cosine_distance(
+            cast(query_embedding, HALFVEC(dim))
+        )
+    if mode == "binary":
+        stored = cast(func.binary_quantize(DocumentChunk.embedding), BIT(dim))
+        query = cast(func.binary_quantize(cast(query_embedding, Vector(dim))), BIT(dim))
+        return stored.op("<~>", return_type=Float)(query)
+    return DocumentChunk.embedding.cosine_distance(query_embedding)
+
+
+def reciprocal_rank_fusion(
+    rankings: list[tuple[list[int], float]],
+    *,
+    rrf_k: int | None = None,
+) -> list[int]:
+    """Merge ranked id lists: score(id) = sum(weight / (rrf_k + rank))."""
+    scores = rrf_scores(rankings, rrf_k=rrf_k)
+    return sorted(scores, key=lambda chunk_id: scores[chunk_id], reverse=True)
+
+
+def rrf_scores(
+    rankings: list[tuple[list[int], float]],
+    *,
+    rrf_k: int | None = None,
+) -> dict[int, float]:
+    rrf_k = settings.RRF_K if rrf_k is None else rrf_k
+    scores: dict[int, float] = {}
+    for ids, weight in rankings:
+        for rank, chunk_id in enumerate(ids, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + weight / (rrf_k + rank)
+    return scores
+
+
+@dataclass(frozen=True)
+class RetrievalFilters:
+    """Restricts retrieval to a subset of the user's documents."""
+
+    document_ids: tuple[int, ...] | None = None
+    file_types: tuple[str, ...] | None = None
+    uploaded_after: datetime | None = None
+    uploaded_before: datetime | None = None
+
+    @classmethod
+    def build(cls, *, document_ids=None, file_types=None, uploaded_after=None, uploaded_before=None):
+        return cls(
+            document_ids=tuple(sorted(set(document_ids))) if document_ids else None,
+            file_types=tuple(sorted({t.lower() for t in file_types})) if file_types else None,
+            uploaded_after=uploaded_after,
+            uploaded_before=uploaded_before,
+        )
+
+    def __bool__(self) -> bool:
+        return any(
+            v is not None
+            for v in (self.document_ids, self.file_types, self.uploaded_after, self.uploaded_before)
+        )
+
+    def cache_key(self) -> dict:
+        return asdict(self)
+
+
+def resolve_filters(db: Session, user_id: UUID, filters: RetrievalFilters) -> tuple[list[int], int]:
+    """Matching document ids and their total chunk count, from the documents indexes."""
+    matching = select(Document.id).where(Document.user_id == user_id)
+    if filters.document_ids:
+        matching = matching.where(Document.id.in_(filters.document_ids))
+    if filters.file_types:
+        matching = matching.where(func.lower(Document.file_type).in_(filters.file_types))
+    if filters.uploaded_after:
+        matching = matching.where(Document.created_at >= filters.uploaded_after)
+    if filters.uploaded_before:
+        matching = matching.where(Document.created_at < filters.uploaded_before)
+    document_ids = list(db.execute(matching).scalars())
+    if not document_ids:
+        return [], 0
+    chunk_count = (
+        db.query(func.count(DocumentChunk.id))
+        .filter(DocumentChunk.user_id == user_id, DocumentChunk.document_id.in_(document_ids))
+        .scalar()
+    )
+    return document_ids, chunk_count
+
+
+@dataclass
+class RetrievedChunk:
+    """Projection of one retrieved chunk; never carries the vector columns."""
+
+    chunk_id: int
+    document_id: int
+    document: str
+    page: int
+    section: str | None
+    text: str
+    distance: float
+    # RRF score when the row comes from hybrid fusion (rows are then in fused
+    # order, not distance order); None for pure vector results.
+    fused_score: float | None = None
+    # Whether the full-text side of a hybrid search matched this chunk.
+    lexical: bool = False
+
+
+_CHUNK_COLUMNS = (
+    DocumentChunk.id,
+    DocumentChunk.document_id,
+    Document.filename,
+    DocumentChunk.page_number,
+    DocumentChunk.section,
+    DocumentChunk.chunk_text,
+)
+
+
+def _chunk_query(db: Session, distance):
+    """Select only the columns retrieval needs, plus one labelled distance expression."""
+    return db.query(*_CHUNK_COLUMNS, distance).join(Document, Document.id == DocumentChunk.document_id)
+
+
+def _to_retrieved(row) -> RetrievedChunk:
+    chunk_id, document_id, filename, page, section, chunk_text, distance = row
+    return RetrievedChunk(
+        chunk_id=chunk_id,
+        document_id=document_id,
+        document=filename,
+        page=page,
+        section=section,
+        text=chunk_text,
+        distance=float(distance),
+    )
+
+
+def _chunk_rows(
+    db: Session,
+    ids: list[int],
+    query_embedding: list[float],
+    fused_scores: dict[int, float] | None = None,
+) -> list[RetrievedChunk]:
+    """Load chunks with their exact distance for ids, keeping the given order."""
+    if not ids:
+        return []
+    distance = DocumentChunk.embedding.cosine_distance(query_embedding).label("distance")
+    rows = _chunk_query(db, distance).filter(DocumentChunk.id.in_(ids)).all()
+    by_id = {row[0]: _to_retrieved(row) for row in rows}
+    if fused_scores is not None:
+        by_id = {i: replace(row, fused_score=fused_scores[i]) for i, row in by_id.items()}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def _fused_rows(
+    db: Session,
+    vector_ids: list[int],
+    lexical_ids: list[int],
+    query_embedding: list[float],
+    k: int,
+) -> list[RetrievedChunk]:
+    scores = rrf_scores(
+        [
+            (vector_ids, settings.HYBRID_VECTOR_WEIGHT),
+            (lexical_ids, settings.HYBRID_LEXICAL_WEIGHT),
+        ]
+    )
+    fused = sorted(scores, key=lambda chunk_id: scores[chunk_id], reverse=True)
+    lexical = set(lexical_ids)
+    return [
+        replace(row, lexical=row.chunk_id in lexical)
+        for row in _chunk_rows(db, fused[:k], query_embedding, scores)
+    ]
+
+
+def _vector_search(
+    db: Session,
+    *,
+    conditions: list,
+    query_embedding: list[float],
+    k: int,
+    mode: str,
+    scan_options: dict,
+    exact: bool = False,
+) -> list[RetrievedChunk]:
+    exact_distance = DocumentChunk.embedding.cosine_distance(query_embedding)
+    distance = exact_distance.label("distance")
+    query = _chunk_query(db, distance).filter(*conditions)
+    if exact:
+        # "+ 0" hides the ORDER BY from the HNSW index, so the planner scans the
+        # (btree-filtered) rows exactly instead of post-filtering an ANN result.
+        return [_to_retrieved(r) for r in query.order_by(exact_distance + 0).limit(k).all()]
+    if mode == "full":
+        configure_ann_scan(db, limit=k, **scan_options)
+        rows = [_to_retrieved(r) for r in query.order_by(distance).limit(k).all()]
+        # relaxed_order iterative scans may return rows slightly out of order.
+        return sorted(rows, key=lambda r: r.distance)
+
+    configure_ann_scan(db, limit=k * settings.RERANK_FACTOR, **scan_options)
+    candidates = (
+        db.query(DocumentChunk.id)
+        .filter(*conditions)
+        .order_by(coarse_distance(query_embedding, mode))
+        .limit(max(k, k * settings.RERANK_FACTOR))
+        .subquery()
+    )
+    # Re-rank the small candidate set in Python so the planner cannot swap the
+    # exact ordering for an index scan that would drop candidates.
+    rows = [_to_retrieved(r) for r in query.filter(DocumentChunk.id.in_(candidates.select())).all()]
+    return sorted(rows, key=lambda r: r.distance)[:k]
+
+
+def lexical_query(query_text):
+    return func.websearch_to_tsquery(literal_column(f"'{TSVECTOR_CONFIG}'::regconfig"), query_text)
+
+
+def _hybrid_search(
+    db: Session,
+    *,
+    conditions: list,
+    query_embedding: list[float],
+    query_text: str,
+    k: int,
+    mode: str,
+    scan_options: dict,
+    exact: bool = False,
+) -> list[RetrievedChunk]:
+    """Vector and full-text rankings fetched in one round trip, fused with RRF."""
+    depth = max(k, settings.HYBRID_CANDIDATES)
+    if exact:
+        coarse = DocumentChunk.embedding.cosine_distance(query_embedding) + 0
+    else:
+        if mode != "full":
+            depth = max(depth, k * settings.RERANK_FACTOR)
+        configure_ann_scan(db, limit=depth, **scan_options)
+        coarse = coarse_distance(query_embedding, mode)
+
+    # The coarse (halfvec/binary) candidates carry their exact distance, so the
+    # vector ranking fed into RRF is re-ranked exactly, as in _vector_search.
+    exact_distance = DocumentChunk.embedding.cosine_distance(query_embedding)
+    vector_ranked = (
+        select(DocumentChunk.id, literal("vector").label("source"), exact_distance.label("score"))
+        .where(*conditions)
+        .order_by(coarse)
+        .limit(depth)
+        .subquery()
+    )
+    lexical_ranked = _lexical_ranked(conditions, query_text, depth)
+    rows = db.execute(union_all(select(vector_ranked), select(lexical_ranked))).all()
+
+    def ranked(source: str) -> list[int]:
+        return [r.id for r in sorted((r for r in rows if r.source == source), key=lambda r: r.score)]
+
+    return _fused_rows(db, ranked("vector"), ranked("lexical"), query_embedding, k)
+
+
+def _lexical_ranked(conditions: list, query_text: str, depth: int):
+    """Subquery of (id, source, score) for the best full-text matches; lower score is better."""
+    tsquery = lexical_query(query_text)
+    lexical_rank = func.ts_rank_cd(DocumentChunk.chunk_tsv, tsquery, type_=Float)
+    return (
+        select(DocumentChunk.id, literal("lexical").label("source"), (-lexical_rank).label("score"))
+        .where(*conditions, DocumentChunk.chunk_tsv.bool_op("@@")(tsquery))
+        .order_by(lexical_rank.desc())
+        .limit(depth)
+        .subquery()
+    )
+
+
+def _in_memory_search(
+    db: Session,
+    index: UserVectorIndex,
+    *,
+    user_id: UUID,
+    query_embedding: list[float],
+    query_text: str | None,
+    k: int,
+) -> list[RetrievedChunk]:
+    """Exact top-k from the user's NumPy index; the lexical side still runs in SQL."""
+    if not (query_text and settings.HYBRID_SEARCH_ENABLED):
+        ids = [chunk_id for chunk_id, _ in index.top_k(query_embedding, k)]
+        return _chunk_rows(db, ids, query_embedding)
+
+    depth = max(k, settings.HYBRID_CANDIDATES)
+    vector_ids = [chunk_id for chunk_id, _ in index.top_k(query_embedding, depth)]
+    lexical = _lexical_ranked([DocumentChunk.user_id == user_id], query_text, depth)
+    lexical_ids = [r.id for r in db.execute(select(lexical.c.id).order_by(lexical.c.score)).all()]
+    return _fused_rows(db, vector_ids, lexical_ids, query_embedding, k)
+
+
+def search_chunks(
+    db: Session,
+    *,
+    user_id: UUID,
+    query_embedding: list[float],
+    k: int,
+    mode: str | None = None,
+    query_text: str | None = None,
+    ef_search: int | None = None,
+    iterative_scan: str | None = None,
+    corpus_version: int | None = None,
+    filters: RetrievalFilters | None = None,
+) -> list[RetrievedChunk]:
+    """Return the user's top-k chunks, nearest (or best fused) first.
+
+    In compact modes the ANN search runs on the quantized index for
+    ``RERANK_FACTOR * k`` candidates, which are then re-ranked exactly
+    against the full-precision vectors. With ``query_text`` and
+    HYBRID_SEARCH_ENABLED, vector and full-text rankings are fused instead.
+    ``ef_search``/``iterative_scan`` override the HNSW settings for this query.
+    Users whose corpus fits the in-memory index are served exactly from NumPy.
+    ``filters`` restrict the search to matching documents; small filtered
+    sets are scanned exactly instead of going through the ANN index.
+    """
+    mode = _mode(mode)
+    conditions = [DocumentChunk.user_id == user_id]
+    exact = False
+    index = None
+    if filters:
+        document_ids, chunk_count = resolve_filters(db, user_id, filters)
+        if not document_ids:
+            return []
+        conditions.append(DocumentChunk.document_id.in_(document_ids))
+        exact = chunk_count <= settings.FILTER_EXACT_SCAN_MAX_CHUNKS
+    elif settings.NUMPY_INDEX_ENABLED:
+        if corpus_version is None:
+            corpus_version = get_corpus_version(db, user_id)
+        index = get_user_index(db, user_id, corpus_version)
+    if index is not None:
+        return _in_memory_search(
+            db,
+            index,
+            user_id=user_id,
+            query_embedding=query_embedding,
+            query_text=query_text,
+            k=k,
+        )
+    scan_options = {"ef_search": ef_search, "iterative_scan": iterative_scan}
+    if filters and not exact and (iterative_scan or settings.HNSW_ITERATIVE_SCAN) == "off":
+        # Without an iterative scan the document filter is applied to a single
+        # ef_search-sized candidate list and can leave fewer than k rows.
+        scan_options["iterative_scan"] = "relaxed_order"
+    if query_text and settings.HYBRID_SEARCH_ENABLED:
+        return _hybrid_search(
+            db,
+            conditions=conditions,
+            query_embedding=query_embedding,
+            query_text=query_text,
+            k=k,
+            mode=mode,
+            scan_options=scan_options,
+            exact=exact,
+        )
+    return _vector_search(
+        db,
+        conditions=conditions,
+        query_embedding=query_embedding,
+        k=k,
+        mode=mode,
+        scan_options=scan_options,
+        exact=exact,
+    )
+
+
+def search_chunks_batch(
+    db: Session,
+    *,
+    user_id: UUID,
+    query_embeddings: list[list[float]],
+    query_texts: list[str] | None = None,
+    k: int,
+    mode: str | None = None,
+) -> list[list[RetrievedChunk]]:
+    """Top-k chunks for many queries with one LATERAL-join round trip.
+
+    Returns one result list per query embedding, in input order. Candidate
+    ranking (vector, plus full-text when hybrid search is enabled) runs in a
+    single statement; the winning chunks are then loaded with one more query.
+    """
+    if not query_embeddings:
+        return []
+    mode = _mode(mode)
+    dim = settings.EMBEDDING_DIM
+    hybrid = bool(query_texts) and settings.HYBRID_SEARCH_ENABLED
+    depth = k if mode == "full" else k * settings.RERANK_FACTOR
+    if hybrid:
+        depth = max(depth, settings.HYBRID_CANDIDATES)
+    configure_ann_scan(db, limit=depth)
+
+    texts = query_texts or [""] * len(query_embeddings)
+    queries = values(
+        column("idx", Integer),
+        column("embedding", Vector(dim)),
+        column("question", Text),
+        name="q",
+    ).data([(i, emb, txt) for i, (emb, txt) in enumerate(zip(query_embeddings, texts))])
+    query_vector = cast(queries.c.embedding, Vector(dim))
+    exact = DocumentChunk.embedding.cosine_distance(query_vector)
+    coarse = coarse_distance(query_vector, mode)
+
+    vector_ranked = (
+        select(
+            DocumentChunk.id.label("chunk_id"),
+            literal("vector").label("source"),
+            coarse.label("score"),
+            exact.label("distance"),
+        )
+        .where(DocumentChunk.user_id == user_id)
+        .order_by(coarse)
+        .limit(depth)
+        .lateral("vector_ranked")
+    )
+    branches = [
+        select(queries.c.idx, vector_ranked).select_from(queries).join(vector_ranked, true())
+    ]
+    if hybrid:
+        tsquery = lexical_query(queries.c.question)
+        lexical_rank = func.ts_rank_cd(DocumentChunk.chunk_tsv, tsquery, type_=Float)
+        lexical_ranked = (
+            select(
+                DocumentChunk.id.label("chunk_id"),
+                literal("lexical").label("source"),
+                (-lexical_rank).label("score"),
+                exact.label("distance"),
+            )
+            .where(DocumentChunk.user_id == user_id, DocumentChunk.chunk_tsv.bool_op("@@")(tsquery))
+            .order_by(lexical_rank.desc())
+            .limit(depth)
+            .lateral("lexical_ranked")
+        )
+        branches.append(
+            select(queries.c.idx, lexical_ranked).select_from(queries).join(lexical_ranked, true())
+        )
+    candidates = db.execute(union_all(*branches) if len(branches) > 1 else branches[0]).all()
+
+    per_query: list[list] = [[] for _ in query_embeddings]
+    distances: list[dict[int, float]] = [{} for _ in query_embeddings]
+    for row in candidates:
+        per_query[row.idx].append(row)
+        distances[row.idx][row.chunk_id] = float(row.distance)
+
+    selected: list[list[int]] = []
+    fused: list[dict[int, float] | None] = []
+    lexical: list[set[int]] = []
+    for rows in per_query:
+        vector_rows = sorted((r for r in rows if r.source == "vector"), key=lambda r: r.distance)
+        vector_ids = [r.chunk_id for r in vector_rows]
+        if hybrid:
+            lexical_rows = sorted((r for r in rows if r.source == "lexical"), key=lambda r: r.score)
+            lexical_ids = [r.chunk_id for r in lexical_rows]
+            scores = rrf_scores(
+                [
+                    (vector_ids, settings.HYBRID_VECTOR_WEIGHT),
+                    (lexical_ids, settings.HYBRID_LEXICAL_WEIGHT),
+                ]
+            )
+            ids = sorted(scores, key=lambda chunk_id: scores[chunk_id], reverse=True)[:k]
+        else:
+            scores, lexical_ids = None, []
+            ids = vector_ids[:k]
+        selected.append(ids)
+        fused.append(scores)
+        lexical.append(set(lexical_ids))
+
+    wanted = {chunk_id for ids in selected for chunk_id in ids}
+    loaded = {}
+    if wanted:
+        # Distances are per query and already known; load the chunk columns once.
+        for row in _chunk_query(db, literal(0.0)).filter(DocumentChunk.id.in_(wanted)).all():
+            loaded[row[0]] = row
+    return [
+        [
+            replace(
+                _to_retrieved(loaded[i]),
+                distance=distances[idx][i],
+                fused_score=fused[idx][i] if fused[idx] is not None else None,
+                lexical=i in lexical[idx],
+            )
+            for i in ids
+            if i in loaded
+        ]
+        for idx, ids in enumerate(selected)
+    ]
@@ -0,0 +1,86 @@
+"""Coalesce identical concurrent calls onto one in-flight computation."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections.abc import Awaitable, Callable, Hashable
+from typing import TypeVar
+
+from app.core import metrics
+
+T = TypeVar("T")
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Callers with the same key share the first caller's result (or exception).
+
+    Keys are only held while the computation runs; nothing is cached
+    afterwards. Threads and event-loop tasks are tracked separately.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+        self._tasks: dict[Hashable, asyncio.Task] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            metrics.incr(f"singleflight.{self.name}.coalesced")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        metrics.incr(f"singleflight.{self.name}.calls")
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Async variant; the shared task outlives a cancelled caller so the others still get it."""
+        task = self._tasks.get(key)
+        if task is not None:
+            metrics.incr(f"singleflight.{self.name}.coalesced")
+        else:
+            metrics.incr(f"singleflight.{self.name}.calls")
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            # Mark the exception retrieved when every caller has gone away.
+            task.exception()
+
+    def stats(self) -> dict:
+        calls = metrics.get(f"singleflight.{self.name}.calls")
+        coalesced = metrics.get(f"singleflight.{self.name}.coalesced")
+        return {
+            "calls": calls,
+            "coalesced": coalesced,
+            "coalesced_rate": round(coalesced / (calls + coalesced), 4) if calls + coalesced else 0.0,
+        }
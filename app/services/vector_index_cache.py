@@ -0,0 +1,149 @@
+"""Process-local NumPy vector indexes for users with small corpora."""
+
+from __future__ import annotations
+
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.core.config import settings
+from app.models import DocumentChunk
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class UserVectorIndex:
+    """L2-normalised float32 matrix of one user's chunk embeddings."""
+
+    ids: np.ndarray
+    matrix: np.ndarray
+
+    @property
+    def nbytes(self) -> int:
+        return self.ids.nbytes + self.matrix.nbytes
+
+    def top_k(self, query_embedding: list[float], k: int) -> list[tuple[int, float]]:
+        """Exact cosine top-k as (chunk_id, cosine distance), nearest first."""
+        n = len(self.ids)
+        if n == 0 or k <= 0:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+        sims = self.matrix @ query
+        if k < n:
+            top = np.argpartition(-sims, k - 1)[:k]
+            top = top[np.argsort(-sims[top])]
+        else:
+            top = np.argsort(-sims)
+        return [(int(self.ids[i]), float(1.0 - sims[i])) for i in top]
+
+
+_TOO_LARGE = object()
+
+
+class VectorIndexCache:
+    """LRU of per-user indexes bounded by total matrix bytes."""
+
+    def __init__(self, max_bytes: int, max_chunks: int):
+        self.max_bytes = max_bytes
+        self.max_chunks = max_chunks
+        # user_id -> (corpus_version, UserVectorIndex | _TOO_LARGE)
+        self._entries: OrderedDict[UUID, tuple[int, object]] = OrderedDict()
+        self._bytes = 0
+        self._generations: dict[UUID, int] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, db: Session, user_id: UUID):
+        count = (
+            db.query(func.count(DocumentChunk.id))
+            .filter(DocumentChunk.user_id == user_id, DocumentChunk.embedding.isnot(None))
+            .scalar()
+        )
+        if count > self.max_chunks:
+            return _TOO_LARGE
+        rows = (
+            db.query(DocumentChunk.id, DocumentChunk.embedding)
+            .filter(DocumentChunk.user_id == user_id, DocumentChunk.embedding.isnot(None))
+            .all()
+        )
+        ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        if rows:
+            matrix = np.asarray([r[1] for r in rows], dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix /= np.maximum(norms, 1e-12)
+        else:
+            matrix = np.zeros((0, settings.EMBEDDING_DIM), dtype=np.float32)
+        return UserVectorIndex(ids=ids, matrix=matrix)
+
+    def get(self, db: Session, user_id: UUID, corpus_version: int) -> UserVectorIndex | None:
+        """Return the user's index, loading it lazily; None means use pgvector."""
+        with self._lock:
+            cached = self._entries.get(user_id)
+            generation = self._generations.get(user_id, 0)
+            if cached is not None and cached[0] == corpus_version:
+                self._entries.move_to_end(user_id)
+                entry = cached[1]
+            else:
+                entry = None
+        if entry is not None:
+            metrics.incr("numpy_index.hits")
+            return None if entry is _TOO_LARGE else entry
+
+        entry = self._load(db, user_id)
+        metrics.incr("numpy_index.loads")
+        if entry is not _TOO_LARGE and entry.nbytes > self.max_bytes:
+            entry = _TOO_LARGE
+        with self._lock:
+            # Skip the insert if the corpus changed while we were loading.
+            if self._generations.get(user_id, 0) == generation:
+                self._put(user_id, (corpus_version, entry))
+        return None if entry is _TOO_LARGE else entry
+
+    def _put(self, user_id: UUID, cached: tuple[int, object]) -> None:
+        self._discard(user_id)
+        self._entries[user_id] = cached
+        if cached[1] is not _TOO_LARGE:
+            self._bytes += cached[1].nbytes
+        while self._bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._discard(oldest)
+
+    def _discard(self, user_id: UUID) -> None:
+        cached = self._entries.pop(user_id, None)
+        if cached is not None and cached[1] is not _TOO_LARGE:
+            self._bytes -= cached[1].nbytes
+
+    def invalidate(self, user_id: UUID) -> None:
+        """Drop a user's index after their corpus changed."""
+        with self._lock:
+            self._discard(user_id)
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"users": len(self._entries), "bytes": self._bytes}
+
+
+_cache = VectorIndexCache(settings.NUMPY_INDEX_MAX_BYTES, settings.NUMPY_INDEX_MAX_CHUNKS)
+
+
+def get_user_index(db: Session, user_id: UUID, corpus_version: int) -> UserVectorIndex | None:
+    if not settings.NUMPY_INDEX_ENABLED:
+        return None
+    return _cache.get(db, user_id, corpus_version)
+
+
+def invalidate_user(user_id: UUID) -> None:
+    _cache.invalidate(user_id)
+
+
+def index_stats() -> dict:
+    return _cache.stats()
@@ -0,0 +1,133 @@
+"""Ingestion worker: runs queued ingestion jobs outside the API process.
+
+    python -m app.worker [--concurrency N]
+
+Start as many worker processes, on as many machines, as needed; they share
+the ``ingestion_jobs`` table. Each process runs up to
+INGESTION_WORKER_CONCURRENCY jobs at a time and stops claiming work on
+SIGINT/SIGTERM, letting running jobs finish.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import IngestionJob
+from app.services.ingestion_service import ingest_document
+from app.services.job_queue import claim_jobs, complete_job, extend_leases, fail_job
+from app.services.rate_limiter import use_ingestion_limits
+
+logger = logging.getLogger("app.worker")
+
+
+class Worker:
+    def __init__(self, concurrency: int):
+        self.concurrency = max(1, concurrency)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._stop = threading.Event()
+        self._running: set[int] = set()
+        self._lock = threading.Lock()
+
+    def stop(self, *_) -> None:
+        logger.info("Worker %s stopping after running jobs finish", self.worker_id)
+        self._stop.set()
+
+    def _run(self, job: IngestionJob) -> None:
+        db = SessionLocal()
+        try:
+            if job.attempts > job.max_attempts:
+                # The previous holder's lease expired on its last attempt.
+                error = job.last_error or "visibility timeout expired"
+                fail_job(db, job, self.worker_id, error, retryable=False)
+                return
+            try:
+                ingest_document(db, job.document_id)
+            except Exception as exc:
+                db.rollback()
+                # A missing document or unsupported file will not succeed on retry.
+                fail_job(
+                    db,
+                    job,
+                    self.worker_id,
+                    f"{type(exc).__name__}: {exc}",
+                    retryable=not isinstance(exc, ValueError),
+                )
+                return
+            complete_job(db, job, self.worker_id)
+        except Exception:
+            logger.exception("Ingestion job %s could not be settled; its lease will expire", job.id)
+        finally:
+            db.close()
+            with self._lock:
+                self._running.discard(job.id)
+
+    def _heartbeat(self) -> None:
+        interval = max(1.0, settings.INGESTION_VISIBILITY_TIMEOUT_SECONDS / 3)
+        # Daemon thread: keeps extending leases while running jobs drain after stop().
+        while True:
+            time.sleep(interval)
+            with self._lock:
+                job_ids = list(self._running)
+            if not job_ids:
+                continue
+            db = SessionLocal()
+            try:
+                extend_leases(db, self.worker_id, job_ids)
+            except Exception:
+                logger.warning("Lease heartbeat failed", exc_info=True)
+            finally:
+                db.close()
+
+    def run(self) -> None:
+        logger.info("Worker %s started (concurrency=%s)", self.worker_id, self.concurrency)
+        heartbeat = threading.Thread(target=self._heartbeat, name="lease-heartbeat", daemon=True)
+        heartbeat.start()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="ingest") as pool:
+            while not self._stop.is_set():
+                with self._lock:
+                    free = self.concurrency - len(self._running)
+                jobs = []
+                if free > 0:
+                    db = SessionLocal()
+                    try:
+                        jobs = claim_jobs(db, self.worker_id, free)
+                    except Exception:
+                        logger.warning("Claiming ingestion jobs failed", exc_info=True)
+                    finally:
+                        db.close()
+                for job in jobs:
+                    logger.info("Running ingestion job %s (document_id=%s)", job.id, job.document_id)
+                    with self._lock:
+                        self._running.add(job.id)
+                    pool.submit(self._run, job)
+                if not jobs:
+                    self._stop.wait(settings.INGESTION_POLL_SECONDS)
+        logger.info("Worker %s stopped", self.worker_id)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=settings.INGESTION_WORKER_CONCURRENCY)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    # Provider buckets are per process: use the ingestion share, not the API's limits.
+    use_ingestion_limits()
+    worker = Worker(args.concurrency)
+    signal.signal(signal.SIGINT, worker.stop)
+    signal.signal(signal.SIGTERM, worker.stop)
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Recall/latency report for the VECTOR_INDEX_MODE options.
+
+Samples stored chunks as queries, computes the exact top-k with index scans
+disabled, then runs the two-stage search of every mode and reports
+recall@k, latency percentiles and index size.
+
+    python benchmark_vector_modes.py --queries 100 --k 5 --create-indexes
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add the app directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from sqlalchemy import func, text
+
+from app.core.database import SessionLocal
+from app.models import DocumentChunk
+from app.services.retrieval_service import (
+    ANN_INDEX_NAMES,
+    VECTOR_INDEX_MODES,
+    ann_index_statement,
+    search_chunks,
+)
+
+
+def exact_top_k(db, user_id, embedding, k: int) -> list[int]:
+    db.execute(text("SET LOCAL enable_indexscan = off"))
+    rows = (
+        db.query(DocumentChunk.id)
+        .filter(DocumentChunk.user_id == user_id)
+        .order_by(DocumentChunk.embedding.cosine_distance(embedding))
+        .limit(k)
+        .all()
+    )
+    db.rollback()
+    return [r.id for r in rows]
+
+
+def index_size(db, mode: str) -> str:
+    size = db.execute(
+        text("SELECT pg_size_pretty(pg_relation_size(to_regclass(:name)))"),
+        {"name": ANN_INDEX_NAMES[mode]},
+    ).scalar()
+    return size or "missing"
+
+
+def run(queries: int, k: int, create_indexes: bool) -> None:
+    db = SessionLocal()
+    try:
+        if create_indexes:
+            for mode in VECTOR_INDEX_MODES:
+                print(f"Ensuring {mode} index...")
+                db.execute(text(ann_index_statement(mode)))
+            db.commit()
+
+        samples = (
+            db.query(DocumentChunk.user_id, DocumentChunk.embedding)
+            .filter(DocumentChunk.embedding.isnot(None))
+            .order_by(func.random())
+            .limit(queries)
+            .all()
+        )
+        if not samples:
+            print("No embedded chunks found.")
+            return
+        truth = [exact_top_k(db, user_id, emb, k) for user_id, emb in samples]
+
+        print(f"\n{len(samples)} queries, k={k}\n")
+        print(f"{'mode':<8} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8}  index size")
+        for mode in VECTOR_INDEX_MODES:
+            recalls, latencies = [], []
+            for (user_id, emb), expected in zip(samples, truth):
+                start = time.perf_counter()
+                rows = search_chunks(db, user_id=user_id, query_embedding=emb, k=k, mode=mode)
+                latencies.append((time.perf_counter() - start) * 1000)
+                found = {r.chunk_id for r in rows}
+                recalls.append(len(found & set(expected)) / max(1, len(expected)))
+            latencies.sort()
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            print(
+                f"{mode:<8} {statistics.mean(recalls):>9.3f} "
+                f"{statistics.median(latencies):>8.1f} {p95:>8.1f}  {index_size(db, mode)}"
+            )
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--create-indexes", action="store_true")
+    args = parser.parse_args()
+    run(args.queries, args.k, args.create_indexes)
@@ -1,3 +1,7 @@
 #!/bin/bash
 cd "$(dirname "$0")"
+# Ingestion jobs are processed by a separate worker process.
+python3 -m app.worker &
+WORKER_PID=$!
+trap 'kill "$WORKER_PID" 2>/dev/null' EXIT
 python3 -m uvicorn app.main:app --reload --port 8000